@@ -0,0 +1,70 @@
+"""
+Response Cache
+
+Content-addressed on-disk cache for Claude responses, so re-running the
+pipeline on an unchanged PDF does not pay for identical requests twice.
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+DEFAULT_CACHE_DIR = ".cache"
+
+
+def make_key(*parts: str) -> str:
+    """
+    Build a cache key from request parts.
+
+    Each part is length-prefixed before hashing so that field boundaries
+    cannot collide (e.g. ("ab", "c") and ("a", "bc") hash differently).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8")
+        digest.update(f"{len(data)}:".encode("ascii"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """JSON file cache stored under <root>/<namespace>/<key[:2]>/<key>.json."""
+
+    def __init__(self, namespace: str, root: str = DEFAULT_CACHE_DIR, max_age: Optional[float] = None):
+        """
+        Args:
+            namespace: Subdirectory separating this cache's entries from others
+            root: Cache root directory
+            max_age: Seconds after which an entry is treated as a miss (default: never)
+        """
+        self.directory = Path(root) / namespace
+        self.max_age = max_age
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached value for key, or None on a miss or an expired entry."""
+        try:
+            with open(self._path(key), "rb") as f:
+                if self.max_age is not None and time.time() - os.fstat(f.fileno()).st_mtime > self.max_age:
+                    return None
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+
+    def put(self, key: str, value: dict) -> None:
+        """Store value under key, replacing any previous entry atomically."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a private temp file first so concurrent readers never see
+        # a partially written entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(value))
+        os.replace(tmp_path, path)
@@ -3,99 +3,234 @@ PDF Extractor Agent
 
 Extracts content from PDF documents and identifies key points using Claude.
 """
-import json
-from typing import List
-
-import pymupdf4llm
-import pymupdf
-import anthropic
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 from .models import (
     Config,
     SectionConfig,
     KeyPoint,
+    KeyPointsExtraction,
     SectionContent,
     ExtractedDocument,
+    PodcastPlan,
+    ExtractionAndPlan,
+)
+from .prompts import (
+    KEY_POINTS_SYSTEM,
+    KEY_POINTS_USER_TEMPLATE,
+    EXTRACT_AND_PLAN_SYSTEM,
+    EXTRACT_AND_PLAN_USER_TEMPLATE,
+    EXTRACT_AND_PLAN_SECTION_TEMPLATE,
+)
+from .pdf_utils import (
+    PARALLEL_RENDER_MIN_PAGES,
+    auto_compress_if_large,
+    default_render_workers,
+    get_pdf_info,
+    pages_to_markdown_parallel,
+    render_pool,
 )
-from .prompts import KEY_POINTS_EXTRACTION_PROMPT
-from .pdf_utils import auto_compress_if_large, get_pdf_info
+from .rate_limiter import RateLimiter
+from .cache import ResponseCache, make_key
+from .llm import CHARS_PER_TOKEN, StructuredOutputError, request_structured
+
+if TYPE_CHECKING:
+    import anthropic
+    import pymupdf
+
+MODEL = "claude-sonnet-4-20250514"
+SINGLE_PASS_MAX_CHARS = 150_000  # Documents below this extract and plan in one call
+# Single-pass output budget: the plan, plus up to 7 key points with exact
+# quotes per section, capped at the model's output limit
+SINGLE_PASS_PLAN_OUTPUT_TOKENS = 2048
+SINGLE_PASS_SECTION_OUTPUT_TOKENS = 1024
+MAX_OUTPUT_TOKENS = 64_000
 
 
 class ExtractorAgent:
     """Agent responsible for extracting and analyzing PDF content."""
 
-    def __init__(self, anthropic_client: anthropic.Anthropic, compress_threshold_mb: float = 10.0):
+    def __init__(
+        self,
+        anthropic_client: "anthropic.Anthropic",
+        compress_threshold_mb: float = 10.0,
+        max_workers: int = 8,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        compressed_cache_dir: Optional[Path] = None
+    ):
         self.client = anthropic_client
         self.compress_threshold_mb = compress_threshold_mb
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.cache = cache
+        self.compressed_cache_dir = compressed_cache_dir
 
     def extract_document(self, config: Config) -> ExtractedDocument:
         """
         Extract content from PDF based on configuration.
 
+        Page text is rendered sequentially (pymupdf Documents are not
+        thread-safe), then key point extraction runs concurrently per section.
+
         Args:
             config: Configuration specifying document path and sections
 
         Returns:
             ExtractedDocument with extracted sections and key points
         """
-        print(f"[Extractor] Opening PDF: {config.document.path}")
+        section_texts = self._render_sections(config)
+        return self._analyze_sections(config, section_texts)
+
+    def extract_and_plan(self, config: Config) -> Tuple[ExtractedDocument, Optional[PodcastPlan]]:
+        """
+        Extract key points and, for small documents, plan the podcast too.
+
+        When the rendered sections total fewer than SINGLE_PASS_MAX_CHARS,
+        one Claude call returns the key points for every section together
+        with the podcast plan, replacing one call per section plus the
+        generator's planning call. Larger documents, requests that would not
+        fit the rate limiter's tokens-per-minute budget, or a failed
+        single-pass call fall back to the per-section pipeline with no plan.
+
+        Args:
+            config: Configuration specifying document path and sections
+
+        Returns:
+            Tuple of (ExtractedDocument, PodcastPlan or None)
+        """
+        section_texts = self._render_sections(config)
+
+        total_chars = sum(len(text) for text in section_texts)
+        if total_chars >= SINGLE_PASS_MAX_CHARS:
+            print(f"[Extractor] {total_chars} characters of text, extracting per section")
+            return self._analyze_sections(config, section_texts), None
 
-        # Auto-compress if PDF is large
-        pdf_path = auto_compress_if_large(config.document.path, self.compress_threshold_mb)
+        print(f"[Extractor] {total_chars} characters of text, extracting and planning in one call")
+        result = self._extract_and_plan_single_pass(config, section_texts)
+        if result is None:
+            return self._analyze_sections(config, section_texts), None
 
-        # Open PDF (use compressed version if available)
-        doc = pymupdf.open(pdf_path)
+        sections = [
+            SectionContent(
+                name=section_config.name,
+                pages=section_config.pages,
+                raw_text=raw_text,
+                key_points=extraction.key_points
+            )
+            for section_config, raw_text, extraction in zip(config.sections, section_texts, result.sections)
+        ]
+        for section in sections:
+            print(f"[Extractor] Found {len(section.key_points)} key points in {section.name}")
+
+        extracted_doc = ExtractedDocument(title=config.document.title, sections=sections)
+        return extracted_doc, result.plan
+
+    def _render_sections(self, config: Config) -> List[str]:
+        """Open (and compress if needed) the PDF and render every section's text."""
+        print(f"[Extractor] Opening PDF: {config.document.path}")
+
+        # Auto-compress if PDF is large; the returned handle is already open
+        pdf_path, doc = auto_compress_if_large(
+            config.document.path, self.compress_threshold_mb, cache_dir=self.compressed_cache_dir
+        )
         total_pages = len(doc)
         print(f"[Extractor] PDF has {total_pages} pages")
 
-        sections = []
-        for section_config in config.sections:
-            print(f"[Extractor] Extracting section: {section_config.name}")
-            section = self._extract_section(doc, section_config, config.document.title)
-            sections.append(section)
-            print(f"[Extractor] Found {len(section.key_points)} key points in {section_config.name}")
+        # Worker processes only pay off once the whole document renders enough
+        # pages; one pool then serves every section
+        rendered_pages = {p for s in config.sections for p in s.pages if 0 < p <= total_pages}
+        num_workers = default_render_workers()
+        use_pool = num_workers > 1 and len(rendered_pages) >= PARALLEL_RENDER_MIN_PAGES
+
+        section_texts = []
+        with render_pool(num_workers) if use_pool else nullcontext() as executor:
+            for section_config in config.sections:
+                print(f"[Extractor] Extracting section: {section_config.name}")
+                section_texts.append(
+                    self._extract_section_text(doc, pdf_path, section_config, executor, num_workers)
+                )
 
         doc.close()
+        return section_texts
+
+    def _analyze_sections(self, config: Config, section_texts: List[str]) -> ExtractedDocument:
+        """Extract key points for each rendered section with one Claude call per section."""
+        # Sections covering the same pages render to identical text; extract
+        # their key points once and share the result
+        representatives = {}
+        for section_config, raw_text in zip(config.sections, section_texts):
+            representative = representatives.setdefault(raw_text, section_config)
+            if representative is not section_config:
+                print(f"[Extractor] {section_config.name} has the same text as {representative.name}, reusing its key points")
+
+        # Claude calls are I/O-bound, so threads overlap their round-trips
+        max_workers = max(1, min(len(representatives), self.max_workers))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self._analyze_section, representatives.values(), representatives.keys())
+            key_points_by_text = dict(zip(representatives.keys(), results))
+
+        sections = [
+            SectionContent(
+                name=section_config.name,
+                pages=section_config.pages,
+                raw_text=raw_text,
+                key_points=list(key_points_by_text[raw_text])
+            )
+            for section_config, raw_text in zip(config.sections, section_texts)
+        ]
 
         return ExtractedDocument(
             title=config.document.title,
             sections=sections
         )
 
-    def _extract_section(
+    def _extract_section_text(
         self,
-        doc: pymupdf.Document,
+        doc: "pymupdf.Document",
+        pdf_path: str,
         section_config: SectionConfig,
-        document_title: str
-    ) -> SectionContent:
-        """Extract a single section from the PDF."""
+        executor: Optional[ProcessPoolExecutor] = None,
+        num_workers: int = 1
+    ) -> str:
+        """Extract the raw text of a single section, on executor's workers if given."""
         # Extract text from specified pages (1-indexed in config, 0-indexed in pymupdf)
-        pages_text = []
-        for page_num in section_config.pages:
-            page_idx = page_num - 1  # Convert to 0-indexed
-            if 0 <= page_idx < len(doc):
-                page = doc[page_idx]
-                # Use pymupdf4llm for better text extraction
-                text = pymupdf4llm.to_markdown(doc, pages=[page_idx])
-                pages_text.append(f"[Page {page_num}]\n{text}")
-            else:
-                print(f"[Extractor] Warning: Page {page_num} out of range")
-
-        raw_text = "\n\n".join(pages_text)
-
-        # Extract key points using Claude
+        total_pages = len(doc)
+        valid_pages = [p for p in section_config.pages if 0 < p <= total_pages]
+        if len(valid_pages) != len(section_config.pages):
+            out_of_range = [p for p in section_config.pages if not 0 < p <= total_pages]
+            print(f"[Extractor] Warning: Page(s) {', '.join(map(str, out_of_range))} out of range")
+
+        if not valid_pages:
+            return ""
+
+        page_indices = sorted({page_num - 1 for page_num in valid_pages})
+        if executor is not None and len(page_indices) > 1:
+            markdown_by_idx = pages_to_markdown_parallel(pdf_path, page_indices, num_workers, executor)
+        else:
+            import pymupdf4llm  # Deferred: slow to import and unused by --help/--compress
+
+            # One pymupdf4llm call for the whole section so layout analysis is
+            # set up once; chunks come back sorted by page with duplicates dropped
+            chunks = pymupdf4llm.to_markdown(doc, pages=page_indices, page_chunks=True)
+            markdown_by_idx = {idx: chunk["text"] for idx, chunk in zip(page_indices, chunks)}
+
+        pages_text = [f"[Page {page_num}]\n{markdown_by_idx[page_num - 1]}" for page_num in valid_pages]
+
+        return "\n\n".join(pages_text)
+
+    def _analyze_section(self, section_config: SectionConfig, raw_text: str) -> List[KeyPoint]:
+        """Identify key points in a section's text. Safe to run on worker threads."""
         key_points = self._extract_key_points(
             raw_text,
             section_config.name,
             section_config.pages
         )
-
-        return SectionContent(
-            name=section_config.name,
-            pages=section_config.pages,
-            raw_text=raw_text,
-            key_points=key_points
-        )
+        print(f"[Extractor] Found {len(key_points)} key points in {section_config.name}")
+        return key_points
 
     def _extract_key_points(
         self,
@@ -106,57 +241,133 @@ class ExtractorAgent:
         """Use Claude to extract key points from section text."""
         pages_str = ", ".join(str(p) for p in pages)
 
-        prompt = KEY_POINTS_EXTRACTION_PROMPT.format(
+        prompt = KEY_POINTS_USER_TEMPLATE.format(
             section_name=section_name,
             pages=pages_str,
             text=text
         )
 
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+        # Identical prompts (unchanged PDF pages) reuse the previous answer
+        cache_key = make_key(MODEL, KEY_POINTS_SYSTEM, prompt)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                # Entries were validated before they were cached, so skip
+                # re-validating every field on the way back in
+                return [
+                    KeyPoint.model_construct(
+                        point=kp["point"],
+                        category=kp["category"],
+                        source_quote=kp["source_quote"],
+                        page=kp["page"]
+                    )
+                    for kp in cached["key_points"]
+                ]
+
+        try:
+            extraction = request_structured(
+                self.client,
+                KeyPointsExtraction,
+                model=MODEL,
+                max_tokens=4096,
+                system=KEY_POINTS_SYSTEM,
+                prompt=prompt,
+                tool_name="record_key_points",
+                rate_limiter=self.rate_limiter
+            )
+        except StructuredOutputError as e:
+            print(f"[Extractor] Warning: Failed to extract key points: {e}")
+            return []
+
+        key_points = extraction.key_points
+        if self.cache is not None and key_points:
+            self.cache.put(cache_key, extraction.model_dump())
+
+        return key_points
+
+    def _extract_and_plan_single_pass(
+        self,
+        config: Config,
+        section_texts: List[str]
+    ) -> Optional[ExtractionAndPlan]:
+        """Ask Claude for every section's key points and the podcast plan in one call."""
+        sections_formatted = "\n\n".join(
+            EXTRACT_AND_PLAN_SECTION_TEMPLATE.format(
+                index=i,
+                section_name=section_config.name,
+                pages=", ".join(str(p) for p in section_config.pages),
+                text=raw_text
+            )
+            for i, (section_config, raw_text) in enumerate(zip(config.sections, section_texts))
+        )
+        prompt = EXTRACT_AND_PLAN_USER_TEMPLATE.format(
+            document_title=config.document.title,
+            sections=sections_formatted
         )
 
-        # Parse response
-        response_text = response.content[0].text
+        cache_key = make_key(MODEL, EXTRACT_AND_PLAN_SYSTEM, prompt)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return ExtractionAndPlan.model_validate(cached)
 
-        # Extract JSON from response (handle potential markdown code blocks)
-        json_str = response_text
-        if "```json" in json_str:
-            json_str = json_str.split("```json")[1].split("```")[0]
-        elif "```" in json_str:
-            json_str = json_str.split("```")[1].split("```")[0]
+        # The whole request has to fit the per-minute input budget; the limiter
+        # would otherwise clamp it and send more than the tier allows
+        input_tokens = (len(EXTRACT_AND_PLAN_SYSTEM) + len(prompt)) // CHARS_PER_TOKEN
+        token_capacity = self.rate_limiter.token_capacity
+        if token_capacity is not None and input_tokens > token_capacity:
+            print(
+                f"[Extractor] ~{input_tokens} input tokens exceeds the {int(token_capacity)} "
+                "tokens/minute budget, falling back to per-section calls"
+            )
+            return None
 
         try:
-            data = json.loads(json_str.strip())
-            key_points = []
-            for kp in data.get("key_points", []):
-                key_points.append(KeyPoint(
-                    point=kp["point"],
-                    category=kp["category"],
-                    source_quote=kp["source_quote"],
-                    page=kp["page"]
-                ))
-            return key_points
-        except json.JSONDecodeError as e:
-            print(f"[Extractor] Warning: Failed to parse key points JSON: {e}")
-            print(f"[Extractor] Raw response: {response_text[:500]}...")
-            return []
+            result = request_structured(
+                self.client,
+                ExtractionAndPlan,
+                model=MODEL,
+                max_tokens=min(
+                    MAX_OUTPUT_TOKENS,
+                    max(8192, SINGLE_PASS_PLAN_OUTPUT_TOKENS + SINGLE_PASS_SECTION_OUTPUT_TOKENS * len(config.sections))
+                ),
+                system=EXTRACT_AND_PLAN_SYSTEM,
+                prompt=prompt,
+                tool_name="record_extraction_and_plan",
+                rate_limiter=self.rate_limiter
+            )
+        except StructuredOutputError as e:
+            print(f"[Extractor] Warning: Single-pass extraction failed, falling back to per-section calls: {e}")
+            return None
+
+        if len(result.sections) != len(config.sections):
+            print(
+                f"[Extractor] Warning: Expected key points for {len(config.sections)} sections, "
+                f"got {len(result.sections)}; falling back to per-section calls"
+            )
+            return None
+
+        if self.cache is not None:
+            self.cache.put(cache_key, result.model_dump())
+
+        return result
 
 
-def extract_document(config: Config, client: anthropic.Anthropic) -> ExtractedDocument:
+def extract_document(
+    config: Config,
+    client: "anthropic.Anthropic",
+    cache: Optional[ResponseCache] = None
+) -> ExtractedDocument:
     """
     Convenience function to extract document.
 
     Args:
         config: Configuration for extraction
         client: Anthropic client
+        cache: Optional response cache for key point extraction
 
     Returns:
         ExtractedDocument with extracted content
     """
-    agent = ExtractorAgent(client)
+    agent = ExtractorAgent(client, cache=cache)
     return agent.extract_document(config)
@@ -4,112 +4,145 @@ Script Generator Agent
 Generates podcast scripts from extracted document content using Claude.
 Two-phase approach: Planning → Dialogue Generation
 """
-import json
-from typing import List
-
-import anthropic
+import orjson
+from typing import TYPE_CHECKING, List, Optional
 
 from .models import (
     ExtractedDocument,
     PodcastPlan,
     PodcastSegment,
-    DialogueLine,
     PodcastScript,
+    DialogueLine,
     KeyPoint,
 )
-from .prompts import PODCAST_PLANNING_PROMPT, DIALOGUE_GENERATION_PROMPT
+from .prompts import (
+    PODCAST_PLANNING_SYSTEM,
+    PODCAST_PLANNING_USER_TEMPLATE,
+    DIALOGUE_GENERATION_SYSTEM,
+    DIALOGUE_GENERATION_USER_TEMPLATE,
+)
+from .cache import ResponseCache, make_key
+from .llm import StructuredOutputError, request_structured
+from .rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    import anthropic
+
+MODEL = "claude-sonnet-4-20250514"
+MIN_WORDS = 1800  # Scripts shorter than this are sent back for expansion
+MAX_EXPANSION_ATTEMPTS = 2
 
 
 class GeneratorAgent:
     """Agent responsible for generating podcast scripts."""
 
-    def __init__(self, anthropic_client: anthropic.Anthropic):
+    def __init__(
+        self,
+        anthropic_client: "anthropic.Anthropic",
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
         self.client = anthropic_client
-
-    def generate_script(self, extracted_doc: ExtractedDocument) -> PodcastScript:
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+
+    def generate_script(
+        self,
+        extracted_doc: ExtractedDocument,
+        plan: Optional[PodcastPlan] = None
+    ) -> PodcastScript:
         """
         Generate a podcast script from extracted document.
 
         Args:
             extracted_doc: Document with extracted sections and key points
+            plan: Plan produced alongside extraction; planning is skipped when given
 
         Returns:
             PodcastScript with dialogue and metadata
         """
+        key_points_with_sources = self._format_key_points_with_sources(extracted_doc)
+
         # Phase 1: Planning
-        print("[Generator] Phase 1: Creating podcast plan...")
-        plan = self._create_plan(extracted_doc)
-        print(f"[Generator] Plan created: {plan.title}")
+        if plan is not None:
+            print(f"[Generator] Phase 1: Using plan from extraction: {plan.title}")
+        else:
+            print("[Generator] Phase 1: Creating podcast plan...")
+            plan = self._create_plan(extracted_doc, self._format_key_points_for_prompt(extracted_doc))
+            print(f"[Generator] Plan created: {plan.title}")
         print(f"[Generator] Friction moment: {plan.friction_moment[:100]}...")
 
         # Phase 2: Dialogue Generation
         print("[Generator] Phase 2: Generating dialogue...")
-        script = self._generate_dialogue(plan, extracted_doc)
+        script = self._generate_dialogue(plan, key_points_with_sources)
         print(f"[Generator] Script generated: {script.word_count} words")
 
         return script
 
     def _format_key_points_for_prompt(self, doc: ExtractedDocument) -> str:
         """Format key points for the planning prompt."""
-        lines = []
-        for section in doc.sections:
-            lines.append(f"\n## {section.name} (pages {', '.join(str(p) for p in section.pages)})")
-            for kp in section.key_points:
-                lines.append(f"- [{kp.category.upper()}] {kp.point}")
-        return "\n".join(lines)
+        return "\n".join(
+            line
+            for section in doc.sections
+            for line in (
+                f"\n## {section.name} (pages {', '.join(map(str, section.pages))})",
+                *(f"- [{kp.category.upper()}] {kp.point}" for kp in section.key_points)
+            )
+        )
 
     def _format_key_points_with_sources(self, doc: ExtractedDocument) -> str:
         """Format key points with source quotes for dialogue generation."""
-        lines = []
-        for section in doc.sections:
-            lines.append(f"\n## {section.name}")
-            for kp in section.key_points:
-                lines.append(f"- {kp.point}")
-                lines.append(f"  Source (p.{kp.page}): \"{kp.source_quote[:200]}...\"" if len(kp.source_quote) > 200 else f"  Source (p.{kp.page}): \"{kp.source_quote}\"")
-        return "\n".join(lines)
-
-    def _create_plan(self, doc: ExtractedDocument) -> PodcastPlan:
-        """Create a podcast plan using Claude."""
-        key_points_formatted = self._format_key_points_for_prompt(doc)
+        return "\n".join(
+            line
+            for section in doc.sections
+            for line in (
+                f"\n## {section.name}",
+                *(
+                    entry
+                    for kp in section.key_points
+                    for entry in (f"- {kp.point}", self._format_source_line(kp))
+                )
+            )
+        )
 
-        prompt = PODCAST_PLANNING_PROMPT.format(
+    @staticmethod
+    def _format_source_line(kp: KeyPoint) -> str:
+        """Format a key point's source reference, truncating long quotes."""
+        quote = f"{kp.source_quote[:200]}..." if len(kp.source_quote) > 200 else kp.source_quote
+        return f"  Source (p.{kp.page}): \"{quote}\""
+
+    def _create_plan(self, doc: ExtractedDocument, key_points_formatted: str) -> PodcastPlan:
+        """Create a podcast plan using Claude."""
+        prompt = PODCAST_PLANNING_USER_TEMPLATE.format(
             document_title=doc.title,
             key_points=key_points_formatted
         )
 
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        response_text = response.content[0].text
-
-        # Extract JSON
-        json_str = self._extract_json(response_text)
+        cache_key = make_key(MODEL, PODCAST_PLANNING_SYSTEM, prompt)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                # Cached plans were validated before being stored
+                return PodcastPlan.model_construct(
+                    **{
+                        **cached,
+                        "segments": [PodcastSegment.model_construct(**s) for s in cached["segments"]],
+                    }
+                )
 
         try:
-            data = json.loads(json_str)
-            segments = [
-                PodcastSegment(
-                    title=s["title"],
-                    key_points_to_cover=s["key_points_to_cover"],
-                    approach=s["approach"]
-                )
-                for s in data.get("segments", [])
-            ]
-            return PodcastPlan(
-                title=data["title"],
-                opening_hook=data["opening_hook"],
-                segments=segments,
-                friction_moment=data["friction_moment"],
-                takeaway=data["takeaway"]
+            plan = request_structured(
+                self.client,
+                PodcastPlan,
+                model=MODEL,
+                max_tokens=4096,
+                system=PODCAST_PLANNING_SYSTEM,
+                prompt=prompt,
+                tool_name="record_plan",
+                rate_limiter=self.rate_limiter
             )
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"[Generator] Warning: Failed to parse plan JSON: {e}")
-            print(f"[Generator] Raw response: {response_text[:500]}...")
+        except StructuredOutputError as e:
+            print(f"[Generator] Warning: Failed to create plan: {e}")
             # Return a default plan
             return PodcastPlan(
                 title=f"Deep Dive: {doc.title}",
@@ -119,76 +152,72 @@ class GeneratorAgent:
                 takeaway="Key insights from the document"
             )
 
-    def _generate_dialogue(self, plan: PodcastPlan, doc: ExtractedDocument) -> PodcastScript:
-        """Generate the actual dialogue script with length enforcement."""
-        key_points_with_sources = self._format_key_points_with_sources(doc)
+        if self.cache is not None:
+            self.cache.put(cache_key, plan.model_dump())
 
+        return plan
+
+    def _generate_dialogue(self, plan: PodcastPlan, key_points_with_sources: str) -> PodcastScript:
+        """Generate the actual dialogue script with length enforcement."""
         # Format plan for prompt
-        plan_formatted = json.dumps({
-            "title": plan.title,
-            "opening_hook": plan.opening_hook,
-            "segments": [
-                {
-                    "title": s.title,
-                    "key_points_to_cover": s.key_points_to_cover,
-                    "approach": s.approach
-                }
-                for s in plan.segments
-            ],
-            "friction_moment": plan.friction_moment,
-            "takeaway": plan.takeaway
-        }, indent=2)
-
-        prompt = DIALOGUE_GENERATION_PROMPT.format(
+        plan_formatted = orjson.dumps(plan.model_dump(), option=orjson.OPT_INDENT_2).decode()
+
+        prompt = DIALOGUE_GENERATION_USER_TEMPLATE.format(
             plan=plan_formatted,
             key_points_with_sources=key_points_with_sources
         )
 
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=8192,  # Larger for ~2000 word dialogue
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        # Keyed on the initial prompt; the cached value is the final
+        # (possibly expanded) script
+        cache_key = make_key(MODEL, DIALOGUE_GENERATION_SYSTEM, prompt)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                # Cached scripts were validated before being stored; skip
+                # per-field validation of what can be hundreds of lines
+                return PodcastScript.model_construct(
+                    **{
+                        **cached,
+                        "dialogue": [DialogueLine.model_construct(**d) for d in cached["dialogue"]],
+                    }
+                )
 
-        response_text = response.content[0].text
-        json_str = self._extract_json(response_text)
-        script = self._parse_dialogue_json(json_str, plan)
+        script = self._request_script(prompt, plan, system=DIALOGUE_GENERATION_SYSTEM)
 
         # Check if script is too short and expand if needed
-        min_words = 1800
-        max_expansion_attempts = 2
-
-        for attempt in range(max_expansion_attempts):
-            if script.word_count >= min_words:
+        for attempt in range(MAX_EXPANSION_ATTEMPTS):
+            if script.word_count >= MIN_WORDS:
                 break
 
             print(f"[Generator] Script too short ({script.word_count} words), expanding (attempt {attempt + 1})...")
-            script = self._expand_script(script, plan, key_points_with_sources)
+            expanded = self._expand_script(script, plan, key_points_with_sources)
+
+            # A failed or shrunken expansion must not replace the draft we have
+            if expanded.word_count <= script.word_count:
+                print(f"[Generator] Expansion did not add words ({expanded.word_count}), keeping previous draft")
+                break
+            script = expanded
+
+        if self.cache is not None and script.dialogue:
+            self.cache.put(cache_key, script.model_dump())
 
         return script
 
-    def _parse_dialogue_json(self, json_str: str, plan: PodcastPlan) -> PodcastScript:
-        """Parse dialogue JSON into PodcastScript."""
+    def _request_script(self, prompt: str, plan: PodcastPlan, system: Optional[str] = None) -> PodcastScript:
+        """Request a full script from Claude, falling back to an empty script on failure."""
         try:
-            data = json.loads(json_str)
-            dialogue = [
-                DialogueLine(
-                    speaker=d["speaker"],
-                    text=d["text"],
-                    emotion_cue=d.get("emotion_cue")
-                )
-                for d in data.get("dialogue", [])
-            ]
-            return PodcastScript(
-                title=data.get("title", plan.title),
-                dialogue=dialogue,
-                friction_moment_summary=data.get("friction_moment_summary", plan.friction_moment),
-                takeaway_summary=data.get("takeaway_summary", plan.takeaway)
+            return request_structured(
+                self.client,
+                PodcastScript,
+                model=MODEL,
+                max_tokens=8192,  # Larger for ~2000 word dialogue
+                system=system,
+                prompt=prompt,
+                tool_name="record_script",
+                rate_limiter=self.rate_limiter
             )
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"[Generator] Warning: Failed to parse dialogue JSON: {e}")
+        except StructuredOutputError as e:
+            print(f"[Generator] Warning: Failed to generate dialogue: {e}")
             return PodcastScript(
                 title=plan.title,
                 dialogue=[],
@@ -198,9 +227,7 @@ class GeneratorAgent:
 
     def _expand_script(self, script: PodcastScript, plan: PodcastPlan, key_points_with_sources: str) -> PodcastScript:
         """Expand a short script to meet the word count target."""
-        current_dialogue = "\n".join([
-            f"{d.speaker}: {d.text}" for d in script.dialogue
-        ])
+        current_dialogue = "\n".join(f"{d.speaker}: {d.text}" for d in script.dialogue)
 
         expand_prompt = f"""The following podcast script is too short at {script.word_count} words. It MUST be expanded to 2000-2200 words.
 
@@ -219,47 +246,30 @@ EXPANSION REQUIREMENTS:
 6. Target 2000-2200 words total - you are REQUIRED to hit this target
 7. Maintain the same friction moment and takeaway themes
 
-Return the EXPANDED script as JSON:
-{{
-    "title": "{script.title}",
-    "dialogue": [
-        {{"speaker": "Alex", "text": "dialogue text", "emotion_cue": "[optional]" or null}}
-    ],
-    "friction_moment_summary": "{script.friction_moment_summary}",
-    "takeaway_summary": "{script.takeaway_summary}"
-}}"""
-
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=8192,
-            messages=[
-                {"role": "user", "content": expand_prompt}
-            ]
-        )
-
-        response_text = response.content[0].text
-        json_str = self._extract_json(response_text)
-        return self._parse_dialogue_json(json_str, plan)
+Return the EXPANDED script with the record_script tool. Keep the title "{script.title}", the friction moment summary "{script.friction_moment_summary}" and the takeaway summary "{script.takeaway_summary}"."""
 
-    def _extract_json(self, text: str) -> str:
-        """Extract JSON from response text, handling markdown code blocks."""
-        if "```json" in text:
-            return text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            return text.split("```")[1].split("```")[0].strip()
-        return text.strip()
+        return self._request_script(expand_prompt, plan)
 
 
-def generate_script(extracted_doc: ExtractedDocument, client: anthropic.Anthropic) -> PodcastScript:
+def generate_script(
+    extracted_doc: ExtractedDocument,
+    client: "anthropic.Anthropic",
+    cache: Optional[ResponseCache] = None,
+    plan: Optional[PodcastPlan] = None,
+    rate_limiter: Optional[RateLimiter] = None
+) -> PodcastScript:
     """
     Convenience function to generate script.
 
     Args:
         extracted_doc: Extracted document with key points
         client: Anthropic client
+        cache: Optional response cache for planning and dialogue calls
+        plan: Optional precomputed plan (see ExtractorAgent.extract_and_plan)
+        rate_limiter: Optional limiter shared with other agents using the same API key
 
     Returns:
         PodcastScript with generated dialogue
     """
-    agent = GeneratorAgent(client)
-    return agent.generate_script(extracted_doc)
+    agent = GeneratorAgent(client, cache=cache, rate_limiter=rate_limiter)
+    return agent.generate_script(extracted_doc, plan=plan)
@@ -0,0 +1,217 @@
+"""
+Claude Call Helpers
+
+Shared helpers for requesting schema-constrained output from Claude. The
+output schema is derived from a Pydantic model and enforced through a forced
+tool call, so responses arrive as parsed arguments instead of free text.
+"""
+import random
+import time
+from typing import TYPE_CHECKING, Optional, Sequence, Type, TypeVar
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+from .rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    import anthropic
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+MAX_ATTEMPTS = 2  # Initial call + one retry with validation feedback
+RATE_LIMIT_RETRIES = 4  # Resubmissions after a 429 that outlasted the SDK's own retries
+RATE_LIMIT_BACKOFF_SECONDS = 2.0  # First backoff when a 429 carries no retry-after
+CHARS_PER_TOKEN = 4  # Rough estimate used to reserve input tokens with the limiter
+
+# Shortest prompt prefix (tools plus system block) each model will cache;
+# a cache_control marker on a shorter prefix is silently ignored
+MIN_CACHEABLE_TOKENS = {
+    "claude-haiku-4-5": 4096,
+    "claude-3-5-haiku": 2048,
+    "claude-3-haiku": 2048,
+}
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024  # Sonnet and Opus
+
+
+class StructuredOutputError(Exception):
+    """Raised when Claude does not return valid structured output."""
+
+    def __init__(self, message: str, tool_input: Optional[dict] = None):
+        super().__init__(message)
+        # The last, invalid tool arguments, for callers that can use part of them
+        self.tool_input = tool_input
+
+
+def tool_for(output_model: Type[BaseModel], tool_name: str, tool_description: str = "") -> dict:
+    """Build a tool definition whose input schema is output_model's JSON schema."""
+    return {
+        "name": tool_name,
+        "description": tool_description or output_model.__doc__ or tool_name,
+        "input_schema": output_model.model_json_schema(),
+    }
+
+
+def cached_system(text: str, model: str, tools: Sequence[dict] = ()) -> list:
+    """
+    Build a system prompt block, marked for Anthropic prompt caching when it can be cached.
+
+    The cached prefix is the tool definitions followed by the system block;
+    when its estimated length is below the model's minimum the block is sent
+    unmarked, since the marker would have no effect.
+    """
+    block = {"type": "text", "text": text}
+    min_tokens = next(
+        (tokens for prefix, tokens in MIN_CACHEABLE_TOKENS.items() if model.startswith(prefix)),
+        DEFAULT_MIN_CACHEABLE_TOKENS
+    )
+    prefix_chars = len(text) + sum(len(orjson.dumps(tool)) for tool in tools)
+    if prefix_chars // CHARS_PER_TOKEN >= min_tokens:
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
+
+
+def request_structured(
+    client: "anthropic.Anthropic",
+    output_model: Type[ModelT],
+    *,
+    model: str,
+    max_tokens: int,
+    prompt: str,
+    tool_name: str,
+    tool_description: str = "",
+    system: Optional[str] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    max_attempts: int = MAX_ATTEMPTS
+) -> ModelT:
+    """
+    Ask Claude for output matching output_model's JSON schema.
+
+    Claude is forced to call a single tool whose input schema is the model's
+    JSON schema, and the response is streamed and assembled client-side. If
+    the arguments fail validation, the error is returned to Claude as a tool
+    result and the request is retried with a short backoff; output cut off
+    at max_tokens is not retried, since the retry would hit the same limit.
+    A 429 that gets
+    past the SDK's own retries pauses the shared rate limiter and is resent.
+
+    Args:
+        client: Anthropic client
+        output_model: Pydantic model describing the expected output
+        model: Claude model name
+        max_tokens: Output token limit
+        prompt: User message content
+        tool_name: Name of the tool Claude must call
+        tool_description: Description of the tool shown to Claude
+        system: Optional static system prompt (prompt-cached when long enough, see cached_system)
+        rate_limiter: Optional limiter acquired before each request and paused on a 429
+        max_attempts: Total number of requests to make before giving up
+
+    Returns:
+        Validated instance of output_model
+
+    Raises:
+        StructuredOutputError: If no valid output was produced within max_attempts
+    """
+    tool = tool_for(output_model, tool_name, tool_description)
+    messages = [{"role": "user", "content": prompt}]
+
+    for attempt in range(max_attempts):
+        request = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "tools": [tool],
+            "tool_choice": {"type": "tool", "name": tool_name},
+            "messages": messages,
+        }
+        if system:
+            request["system"] = cached_system(system, model, [tool])
+
+        # The system block is reserved too: writing it to the prompt cache
+        # counts toward the input-token limit, and concurrent requests each
+        # write it. _send hands back whatever turned out to be a cache read
+        input_tokens = (len(prompt) + len(system or "")) // CHARS_PER_TOKEN
+        response = _send(client, request, rate_limiter, input_tokens)
+
+        tool_use = next((block for block in response.content if block.type == "tool_use"), None)
+        if response.stop_reason == "max_tokens":
+            # A retry would be cut off at the same output limit, so give up
+            # at once and leave the fallback to the caller
+            raise StructuredOutputError(
+                f"{tool_name} output was cut off at max_tokens={max_tokens}",
+                tool_use.input if tool_use is not None else None
+            )
+        if tool_use is None:
+            raise StructuredOutputError(f"Claude did not call {tool_name} (stop reason: {response.stop_reason})")
+
+        try:
+            return output_model.model_validate(tool_use.input)
+        except ValidationError as e:
+            if attempt + 1 >= max_attempts:
+                raise StructuredOutputError(f"Invalid {tool_name} output: {e}", tool_use.input) from e
+
+            # Send the validation error back so the retry can correct it
+            messages = messages + [
+                {"role": "assistant", "content": response.content},
+                {
+                    "role": "user",
+                    "content": [{
+                        "type": "tool_result",
+                        "tool_use_id": tool_use.id,
+                        "content": f"Your output had error: {e}. Fix and retry.",
+                        "is_error": True,
+                    }],
+                },
+            ]
+            time.sleep(1.0 * (attempt + 1))
+
+
+def _send(
+    client: "anthropic.Anthropic",
+    request: dict,
+    rate_limiter: Optional[RateLimiter],
+    input_tokens: int
+) -> "anthropic.types.Message":
+    """
+    Stream one request to completion, resubmitting it after a 429.
+
+    The SDK already retries a 429 a couple of times per request; when one
+    still gets through, every worker sharing the rate limiter is paused
+    for the server's retry-after (or a jittered exponential backoff), so
+    concurrent batches stop hammering the limit together.
+    """
+    import anthropic
+
+    for retry in range(RATE_LIMIT_RETRIES + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire(input_tokens)
+
+        try:
+            # Streaming keeps the connection busy while long scripts are
+            # generated instead of idling on one blocking read; the tool input
+            # still has to be complete before it can be validated
+            with client.messages.stream(**request) as stream:
+                response = stream.get_final_message()
+        except anthropic.RateLimitError as e:
+            if retry == RATE_LIMIT_RETRIES:
+                raise
+
+            delay = _retry_after(e) or RATE_LIMIT_BACKOFF_SECONDS * 2 ** retry
+            delay += random.uniform(0, delay / 4)
+            if rate_limiter is not None:
+                rate_limiter.backoff(delay)
+            else:
+                time.sleep(delay)
+        else:
+            # Prompt-cache reads do not count toward the input-token limit
+            if rate_limiter is not None and response.usage.cache_read_input_tokens:
+                rate_limiter.release(response.usage.cache_read_input_tokens)
+            return response
+
+
+def _retry_after(error: "anthropic.RateLimitError") -> Optional[float]:
+    """Seconds the server asked us to wait, if it said."""
+    try:
+        return float(error.response.headers["retry-after"])
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -5,23 +5,35 @@ A system that transforms long-form documents into two-host podcast scripts
 with a verification layer for accuracy and coverage checking.
 """
 import argparse
-import json
+import logging
 import os
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 from dotenv import load_dotenv
 import yaml
-import anthropic
+
+try:
+    from yaml import CSafeLoader as YamlLoader  # libyaml-backed
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    tomllib = None
 
 # Load environment variables from .env file
 load_dotenv()
 
 from .models import Config, DocumentConfig, SectionConfig
-from .extractor import ExtractorAgent
-from .generator import generate_script
-from .verifier import verify_script
-from .pdf_utils import compress_pdf, get_pdf_info
+from .cache import ResponseCache
+
+# The agents, anthropic and pymupdf take a second or two to import, so they are
+# imported where they are used to keep --help and --compress fast
+if TYPE_CHECKING:
+    import anthropic
 
 
 def select_pdf_from_data_dir(data_dir: str = "data") -> str:
@@ -69,10 +81,21 @@ def select_pdf_from_data_dir(data_dir: str = "data") -> str:
             print(f"Invalid input. Please enter a number between 1 and {len(pdf_files)}")
 
 
-def load_config(config_path: str) -> Config:
-    """Load configuration from YAML file."""
+def read_config_file(config_path: str) -> dict:
+    """Read raw configuration data from a YAML or TOML (.toml) file."""
+    if Path(config_path).suffix == ".toml":
+        if tomllib is None:
+            raise RuntimeError("TOML configuration requires Python 3.11+")
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
+
     with open(config_path, "r") as f:
-        data = yaml.safe_load(f)
+        return yaml.load(f, Loader=YamlLoader)
+
+
+def load_config(config_path: str) -> Config:
+    """Load configuration from a YAML or TOML file."""
+    data = read_config_file(config_path)
 
     pdf_path = data["document"]["path"]
 
@@ -98,7 +121,7 @@ def load_config(config_path: str) -> Config:
     )
 
 
-def save_outputs(script_md: str, report_dict: dict, output_dir: str) -> tuple:
+def save_outputs(script_md: str, report_json: bytes, output_dir: str) -> tuple:
     """Save generated outputs to files."""
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -109,21 +132,57 @@ def save_outputs(script_md: str, report_dict: dict, output_dir: str) -> tuple:
     with open(script_path, "w") as f:
         f.write(script_md)
 
-    with open(report_path, "w") as f:
-        json.dump(report_dict, f, indent=2)
+    with open(report_path, "wb") as f:
+        f.write(report_json)
 
     return script_path, report_path
 
 
-def run_pipeline(config_path: str, output_dir: str = "output", compress_threshold_mb: float = 10.0) -> None:
+def create_client(api_key: str) -> "anthropic.Anthropic":
+    """
+    Create the Anthropic client shared by all agents.
+
+    One HTTP/2 connection pool is reused for every call, so concurrent
+    extraction and verification requests multiplex over a few warm
+    connections instead of paying a TCP/TLS handshake each.
+    """
+    import anthropic
+    import httpx
+
+    http_client = anthropic.DefaultHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+    )
+    return anthropic.Anthropic(api_key=api_key, http_client=http_client)
+
+
+def run_pipeline(
+    config_path: str,
+    output_dir: str = "output",
+    compress_threshold_mb: float = 10.0,
+    use_cache: bool = True,
+    use_batch_api: bool = False,
+    fuse_verification: bool = False,
+    tokens_per_minute: Optional[int] = 30_000
+) -> None:
     """
     Run the complete PDF-to-Podcast pipeline.
 
     Args:
-        config_path: Path to YAML configuration file
+        config_path: Path to YAML or TOML configuration file
         output_dir: Directory for output files
         compress_threshold_mb: Size threshold in MB above which to auto-compress PDF
+        use_cache: Reuse cached Claude responses and compressed PDFs for identical inputs
+        use_batch_api: Verify claims through the Message Batches API
+        fuse_verification: Extract claims and analyze coverage in one Haiku call
+        tokens_per_minute: Input tokens per minute the API key allows (None: unlimited)
     """
+    from .extractor import ExtractorAgent
+    from .generator import generate_script
+    from .pdf_utils import COMPRESSED_CACHE_DIR
+    from .rate_limiter import RateLimiter
+    from .verifier import verify_script
+
     # Check for API key
     api_key = os.environ.get("ANTHROPIC_API_KEY")
     if not api_key:
@@ -131,8 +190,10 @@ def run_pipeline(config_path: str, output_dir: str = "output", compress_threshol
         print("Please set it with: export ANTHROPIC_API_KEY='your-key-here'")
         sys.exit(1)
 
-    # Initialize client
-    client = anthropic.Anthropic(api_key=api_key)
+    # Initialize client; all agents share one limiter so their requests
+    # count against the same per-minute budget and a 429 pauses all of them
+    client = create_client(api_key)
+    rate_limiter = RateLimiter(tokens_per_minute=tokens_per_minute)
 
     # Load configuration
     print(f"\n{'='*60}")
@@ -151,8 +212,14 @@ def run_pipeline(config_path: str, output_dir: str = "output", compress_threshol
     print("STAGE 1: Document Extraction")
     print(f"{'-'*60}\n")
 
-    extractor = ExtractorAgent(client, compress_threshold_mb=compress_threshold_mb)
-    extracted_doc = extractor.extract_document(config)
+    extractor = ExtractorAgent(
+        client,
+        compress_threshold_mb=compress_threshold_mb,
+        rate_limiter=rate_limiter,
+        cache=ResponseCache("extract") if use_cache else None,
+        compressed_cache_dir=COMPRESSED_CACHE_DIR if use_cache else None
+    )
+    extracted_doc, plan = extractor.extract_and_plan(config)
     print(f"\nExtraction complete: {extracted_doc.total_key_points} key points found")
 
     # Stage 2: Script Generation
@@ -160,7 +227,13 @@ def run_pipeline(config_path: str, output_dir: str = "output", compress_threshol
     print("STAGE 2: Script Generation")
     print(f"{'-'*60}\n")
 
-    script = generate_script(extracted_doc, client)
+    script = generate_script(
+        extracted_doc,
+        client,
+        cache=ResponseCache("generate") if use_cache else None,
+        plan=plan,
+        rate_limiter=rate_limiter
+    )
     print(f"\nScript generated: {script.word_count} words")
 
     # Stage 3: Verification
@@ -168,7 +241,16 @@ def run_pipeline(config_path: str, output_dir: str = "output", compress_threshol
     print("STAGE 3: Verification")
     print(f"{'-'*60}\n")
 
-    report = verify_script(script, extracted_doc, client)
+    report = verify_script(
+        script,
+        extracted_doc,
+        client,
+        use_batch_api=use_batch_api,
+        cache=ResponseCache("verify") if use_cache else None,
+        fuse_extraction_and_coverage=fuse_verification,
+        report_cache=ResponseCache("verify_report") if use_cache else None,
+        rate_limiter=rate_limiter
+    )
 
     # Save outputs
     print(f"\n{'-'*60}")
@@ -177,7 +259,7 @@ def run_pipeline(config_path: str, output_dir: str = "output", compress_threshol
 
     script_path, report_path = save_outputs(
         script.to_markdown(),
-        report.to_dict(),
+        report.to_json_bytes(),
         output_dir
     )
 
@@ -217,7 +299,7 @@ def main():
     parser.add_argument(
         "--config", "-c",
         default="config.yaml",
-        help="Path to configuration YAML file (default: config.yaml)"
+        help="Path to configuration YAML or TOML file (default: config.yaml)"
     )
     parser.add_argument(
         "--output", "-o",
@@ -235,20 +317,58 @@ def main():
         type=str,
         help="Compress a PDF file and exit (utility mode)"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached Claude responses in .cache/ and compressed PDFs, and always recompute"
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Verify claims with the Message Batches API (half price, may take minutes)"
+    )
+    parser.add_argument(
+        "--fuse-verification",
+        action="store_true",
+        help="Extract claims and analyze coverage in one Haiku call instead of two"
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=int,
+        default=30_000,
+        help="Input tokens per minute allowed by your API tier, 0 for no limit (default: 30000)"
+    )
 
     args = parser.parse_args()
 
+    # Our modules log progress at INFO; show it alongside the printed output
+    # without turning on INFO logging from third-party libraries (httpx)
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    logging.getLogger(__package__).setLevel(logging.INFO)
+
     # Utility mode: just compress a PDF
     if args.compress:
-        info = get_pdf_info(args.compress)
-        print(f"PDF: {info['path']}")
-        print(f"Size: {info['file_size_mb']:.2f} MB")
-        print(f"Pages: {info['page_count']}")
-        compress_pdf(args.compress)
+        from .pdf_utils import COMPRESSED_CACHE_DIR, PdfSession
+
+        # One session so the PDF is parsed once for both info and compression
+        with PdfSession(args.compress) as session:
+            info = session.info()
+            print(f"PDF: {info['path']}")
+            print(f"Size: {info['file_size_mb']:.2f} MB")
+            print(f"Pages: {info['page_count']}")
+            session.compress(cache_dir=None if args.no_cache else COMPRESSED_CACHE_DIR)
         sys.exit(0)
 
     try:
-        run_pipeline(args.config, args.output, args.compress_threshold)
+        run_pipeline(
+            args.config,
+            args.output,
+            args.compress_threshold,
+            use_cache=not args.no_cache,
+            use_batch_api=args.batch_api,
+            fuse_verification=args.fuse_verification,
+            tokens_per_minute=args.tokens_per_minute or None
+        )
     except FileNotFoundError as e:
         print(f"Error: {e}")
         sys.exit(1)
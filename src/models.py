@@ -1,8 +1,14 @@
 """
 Pydantic models for the PDF-to-Podcast system.
 """
-from typing import List, Optional, Literal
-from pydantic import BaseModel, Field
+from __future__ import annotations
+
+import io
+from enum import IntEnum
+from functools import cached_property
+from typing import Literal
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, field_serializer, field_validator
 
 
 # ============================================================================
@@ -11,6 +17,10 @@ from pydantic import BaseModel, Field
 
 class KeyPoint(BaseModel):
     """A key point extracted from a document section."""
+    # Frozen, like DialogueLine and PodcastSegment: these are allocated in
+    # the hundreds per run and shared between sections with identical text
+    model_config = ConfigDict(frozen=True)
+
     point: str = Field(description="The key point summary")
     category: Literal["fact", "strategy", "market", "context"] = Field(
         description="Category of the key point"
@@ -19,21 +29,26 @@ class KeyPoint(BaseModel):
     page: int = Field(description="Page number where this point was found")
 
 
+class KeyPointsExtraction(BaseModel):
+    """Key points identified in one document section."""
+    key_points: list[KeyPoint] = Field(description="Key points extracted from the section")
+
+
 class SectionContent(BaseModel):
     """Content extracted from a document section."""
     name: str = Field(description="Section name")
-    pages: List[int] = Field(description="Page numbers covered")
+    pages: list[int] = Field(description="Page numbers covered")
     raw_text: str = Field(description="Raw extracted text")
-    key_points: List[KeyPoint] = Field(default_factory=list, description="Extracted key points")
+    key_points: list[KeyPoint] = Field(default_factory=list, description="Extracted key points")
 
 
 class ExtractedDocument(BaseModel):
     """Complete extracted document with all sections."""
     title: str = Field(description="Document title")
-    sections: List[SectionContent] = Field(description="Extracted sections")
+    sections: list[SectionContent] = Field(description="Extracted sections")
 
     @property
-    def all_key_points(self) -> List[KeyPoint]:
+    def all_key_points(self) -> list[KeyPoint]:
         """Get all key points from all sections."""
         return [kp for section in self.sections for kp in section.key_points]
 
@@ -49,8 +64,10 @@ class ExtractedDocument(BaseModel):
 
 class PodcastSegment(BaseModel):
     """A segment in the podcast plan."""
+    model_config = ConfigDict(frozen=True)
+
     title: str = Field(description="Segment title")
-    key_points_to_cover: List[str] = Field(description="Key points this segment covers")
+    key_points_to_cover: list[str] = Field(description="Key points this segment covers")
     approach: str = Field(description="How to present this segment")
 
 
@@ -58,85 +75,214 @@ class PodcastPlan(BaseModel):
     """Plan for the podcast episode."""
     title: str = Field(description="Podcast episode title")
     opening_hook: str = Field(description="Opening hook to grab attention")
-    segments: List[PodcastSegment] = Field(description="Planned segments")
+    segments: list[PodcastSegment] = Field(description="Planned segments")
     friction_moment: str = Field(description="The moment where hosts disagree or push back")
     takeaway: str = Field(description="Clear 'so what' takeaway at the end")
 
 
+class ExtractionAndPlan(BaseModel):
+    """Key points for every document section plus the podcast plan built from them."""
+    sections: list[KeyPointsExtraction] = Field(
+        description="Key points for each section, in the order the sections were given"
+    )
+    plan: PodcastPlan = Field(description="Podcast plan covering the extracted key points")
+
+
 class DialogueLine(BaseModel):
     """A single line of dialogue in the podcast script."""
+    model_config = ConfigDict(frozen=True)
+
     speaker: Literal["Alex", "Jordan"] = Field(description="Speaker name")
     text: str = Field(description="The dialogue text")
-    emotion_cue: Optional[str] = Field(default=None, description="Emotion cue like [laughs], [thoughtful]")
+    emotion_cue: str | None = Field(default=None, description="Emotion cue like [laughs], [thoughtful]")
 
 
 class PodcastScript(BaseModel):
     """Complete podcast script."""
     title: str = Field(description="Episode title")
-    dialogue: List[DialogueLine] = Field(description="The dialogue lines")
+    dialogue: list[DialogueLine] = Field(description="The dialogue lines")
     friction_moment_summary: str = Field(description="Summary of the friction/disagreement moment")
     takeaway_summary: str = Field(description="Summary of the main takeaway")
 
-    @property
+    # Cached: dialogue is never mutated after construction, and these are
+    # read several times per run (logging, length checks, markdown, report,
+    # claim extraction and coverage prompts)
+    @cached_property
     def word_count(self) -> int:
         """Calculate total word count of dialogue."""
         return sum(len(line.text.split()) for line in self.dialogue)
 
+    @cached_property
+    def numbered_dialogue(self) -> str:
+        """Dialogue as "[i] Speaker cue: text" lines, as the verifier prompts quote it."""
+        return "\n".join([
+            f"[{i}] {line.speaker} {line.emotion_cue}: {line.text}" if line.emotion_cue
+            else f"[{i}] {line.speaker}: {line.text}"
+            for i, line in enumerate(self.dialogue)
+        ])
+
     def to_markdown(self) -> str:
         """Convert script to markdown format."""
-        lines = [f"# {self.title}", "", f"*~{self.word_count} words*", "", "---", ""]
+        buf = io.StringIO()
+        buf.write(f"# {self.title}\n\n*~{self.word_count} words*\n\n---\n\n")
 
+        write = buf.write
         for line in self.dialogue:
             emotion = f" {line.emotion_cue}" if line.emotion_cue else ""
-            lines.append(f"**{line.speaker}:**{emotion} {line.text}")
-            lines.append("")
-
-        lines.extend([
-            "---",
-            "",
-            f"**Friction Moment:** {self.friction_moment_summary}",
-            "",
+            write(f"**{line.speaker}:**{emotion} {line.text}\n\n")
+
+        buf.write(
+            f"---\n\n"
+            f"**Friction Moment:** {self.friction_moment_summary}\n\n"
             f"**Key Takeaway:** {self.takeaway_summary}"
-        ])
+        )
 
-        return "\n".join(lines)
+        return buf.getvalue()
 
 
 # ============================================================================
 # Verifier Models
 # ============================================================================
 
+class VerificationStatus(IntEnum):
+    """How well the source document supports a claim."""
+    SUPPORTED = 0
+    PARTIALLY_SUPPORTED = 1
+    NOT_FOUND = 2
+
+
+class CoverageStatus(IntEnum):
+    """How fully the script covers a section's key points."""
+    FULL = 0
+    PARTIAL = 1
+    OMITTED = 2
+
+
+def _status_from_name(enum_cls: type[IntEnum], value):
+    """Accept a status by name (as Claude and the JSON report spell it) or by value."""
+    if isinstance(value, str):
+        try:
+            return enum_cls[value]
+        except KeyError:
+            raise ValueError(f"Unknown {enum_cls.__name__}: {value!r}") from None
+    return value
+
+
+# Verifier models are only needed once a script reaches verification, so
+# their validators are built on first use rather than at import. Report
+# models are frozen; extra="forbid" is left off the models parsed directly
+# from Claude's tool input, where stray keys should be ignored. Those spell
+# statuses as string literals so the tool schema shows names, not ints.
 class ExtractedClaim(BaseModel):
     """A factual claim extracted from the podcast script."""
+    model_config = ConfigDict(frozen=True, defer_build=True)
+
     claim: str = Field(description="The factual claim")
     script_context: str = Field(description="The dialogue line containing this claim")
-    line_index: int = Field(description="Index of the dialogue line")
+    line_index: int = Field(default=0, description="Index of the dialogue line")
+
+
+class ClaimExtraction(BaseModel):
+    """Claims extracted from a podcast script, as returned by Claude."""
+    model_config = ConfigDict(defer_build=True)
+
+    claims: list[ExtractedClaim] = Field(default_factory=list, description="Extracted factual claims")
+
+
+class ClaimVerdict(BaseModel):
+    """Claude's verdict on one claim of a verification batch."""
+    model_config = ConfigDict(defer_build=True)
+
+    claim_id: int = Field(description="Index of the claim in the batch")
+    status: Literal["SUPPORTED", "PARTIALLY_SUPPORTED", "NOT_FOUND"] = Field(
+        description="Verification status"
+    )
+    source_page: int | None = Field(default=None, description="Page where evidence was found")
+    source_quote: str | None = Field(default=None, description="Brief supporting quote from source")
+    explanation: str = Field(description="One sentence explanation")
+
+
+class BatchVerification(BaseModel):
+    """Verdicts for every claim in a verification batch."""
+    model_config = ConfigDict(defer_build=True)
+
+    verifications: list[ClaimVerdict] = Field(description="One verdict per claim")
+
+
+class SectionCoverage(BaseModel):
+    """Claude's coverage analysis of one section."""
+    model_config = ConfigDict(defer_build=True)
+
+    section: str = Field(description="Section name, exactly as given")
+    status: Literal["FULL", "PARTIAL", "OMITTED"] = Field(description="Coverage status")
+    key_points_total: int = Field(description="Total key points in section")
+    key_points_covered: int = Field(description="Number of key points covered")
+    covered: list[str] = Field(description="Key points that were covered")
+    omitted: list[str] = Field(description="Key points that were omitted")
+
+
+class CoverageAnalysis(BaseModel):
+    """Coverage of every document section by the podcast script."""
+    model_config = ConfigDict(defer_build=True)
+
+    coverage: list[SectionCoverage] = Field(description="One entry per section")
+
+
+class ClaimsAndCoverage(BaseModel):
+    """Claims extracted from a podcast script and its coverage of every section."""
+    model_config = ConfigDict(defer_build=True)
+
+    claims: list[ExtractedClaim] = Field(description="Extracted factual claims")
+    coverage: list[SectionCoverage] = Field(description="One entry per section")
 
 
 class ClaimVerification(BaseModel):
     """Verification result for a single claim."""
+    model_config = ConfigDict(frozen=True, extra="forbid", defer_build=True)
+
     claim: str = Field(description="The factual claim")
     script_context: str = Field(description="Context from script")
-    source_page: Optional[int] = Field(default=None, description="Page where evidence was found")
-    source_quote: Optional[str] = Field(default=None, description="Supporting quote from source")
-    status: Literal["SUPPORTED", "PARTIALLY_SUPPORTED", "NOT_FOUND"] = Field(
-        description="Verification status"
-    )
+    source_page: int | None = Field(default=None, description="Page where evidence was found")
+    source_quote: str | None = Field(default=None, description="Supporting quote from source")
+    status: VerificationStatus = Field(description="Verification status")
     explanation: str = Field(description="Explanation for the verification status")
 
+    # Statuses are stored as small ints but read and written by name
+    @field_validator("status", mode="before")
+    @classmethod
+    def _parse_status(cls, value):
+        return _status_from_name(VerificationStatus, value)
+
+    @field_serializer("status")
+    def _serialize_status(self, status: VerificationStatus) -> str:
+        return status.name
+
 
 class CoverageItem(BaseModel):
     """Coverage analysis for a single section."""
+    model_config = ConfigDict(frozen=True, extra="forbid", defer_build=True)
+
     section: str = Field(description="Section name")
-    status: Literal["FULL", "PARTIAL", "OMITTED"] = Field(description="Coverage status")
+    status: CoverageStatus = Field(description="Coverage status")
     key_points_total: int = Field(description="Total key points in section")
     key_points_covered: int = Field(description="Number of key points covered")
-    covered: List[str] = Field(description="Key points that were covered")
-    omitted: List[str] = Field(description="Key points that were omitted")
+    covered: list[str] = Field(description="Key points that were covered")
+    omitted: list[str] = Field(description="Key points that were omitted")
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _parse_status(cls, value):
+        return _status_from_name(CoverageStatus, value)
+
+    @field_serializer("status")
+    def _serialize_status(self, status: CoverageStatus) -> str:
+        return status.name
 
 
 class VerificationReport(BaseModel):
     """Complete verification report."""
+    model_config = ConfigDict(frozen=True, extra="forbid", defer_build=True)
+
     document_title: str = Field(description="Title of the source document")
     script_title: str = Field(description="Title of the podcast script")
     script_word_count: int = Field(description="Word count of the script")
@@ -152,14 +298,64 @@ class VerificationReport(BaseModel):
     overall_coverage_percentage: float = Field(description="Overall coverage percentage")
 
     # Details
-    claim_verifications: List[ClaimVerification] = Field(description="Detailed claim verifications")
-    coverage_analysis: List[CoverageItem] = Field(description="Coverage by section")
-    hallucination_flags: List[ClaimVerification] = Field(
-        description="Claims flagged as potential hallucinations"
+    claim_verifications: list[ClaimVerification] = Field(description="Detailed claim verifications")
+    coverage_analysis: list[CoverageItem] = Field(description="Coverage by section")
+    # Flags point into claim_verifications instead of repeating its entries
+    hallucination_flag_ids: list[int] = Field(
+        description="Indices into claim_verifications of claims flagged as potential hallucinations"
     )
 
+    @property
+    def hallucination_flags(self) -> list[ClaimVerification]:
+        """Claims flagged as potential hallucinations."""
+        return [self.claim_verifications[i] for i in self.hallucination_flag_ids]
+
+    @classmethod
+    def build(cls, **fields) -> "VerificationReport":
+        """
+        Assemble a report from already-validated verifier results.
+
+        Skips Pydantic validation (the claim verifications and coverage
+        items were validated when they were created) and only checks the
+        counts agree. Use the regular constructor for untrusted input.
+
+        Raises:
+            ValueError: If the summary counts do not match the details
+        """
+        total = fields["total_claims"]
+        if len(fields["claim_verifications"]) != total:
+            raise ValueError(
+                f"Report has {len(fields['claim_verifications'])} claim verifications "
+                f"but total_claims={total}"
+            )
+        counted = fields["supported_claims"] + fields["partially_supported_claims"] + fields["unsupported_claims"]
+        if counted != total:
+            raise ValueError(f"Claim status counts sum to {counted}, expected {total}")
+        if not all(0 <= i < total for i in fields["hallucination_flag_ids"]):
+            raise ValueError("Hallucination flag ids must index claim_verifications")
+
+        return cls.model_construct(**fields)
+
     def to_dict(self) -> dict:
         """Convert to dictionary for JSON serialization."""
+        # The detail lists use the models' own field names and order, so one
+        # serializer pass replaces a dict comprehension per list
+        details = self.model_dump(include={"claim_verifications", "coverage_analysis"})
+        return self._layout(details["claim_verifications"], details["coverage_analysis"])
+
+    def to_json_bytes(self) -> bytes:
+        """Serialize the report (same layout as to_dict) to indented JSON bytes."""
+        # The detail models are handed to orjson as-is and converted one at a
+        # time by _report_default while the output is written, instead of
+        # materializing the full to_dict() tree first
+        return orjson.dumps(
+            self._layout(self.claim_verifications, self.coverage_analysis),
+            default=_report_default,
+            option=orjson.OPT_INDENT_2
+        )
+
+    def _layout(self, claim_traceability: list, coverage_analysis: list) -> dict:
+        """Arrange the report fields into the published JSON layout."""
         return {
             "metadata": {
                 "document_title": self.document_title,
@@ -174,56 +370,51 @@ class VerificationReport(BaseModel):
                 "support_rate": f"{self.support_rate:.1f}%",
                 "coverage_percentage": f"{self.overall_coverage_percentage:.1f}%"
             },
-            "claim_traceability": [
-                {
-                    "claim": cv.claim,
-                    "script_context": cv.script_context,
-                    "source_page": cv.source_page,
-                    "source_quote": cv.source_quote,
-                    "status": cv.status,
-                    "explanation": cv.explanation
-                }
-                for cv in self.claim_verifications
-            ],
+            "claim_traceability": claim_traceability,
             "hallucination_flags": [
                 {
-                    "claim": hf.claim,
-                    "script_context": hf.script_context,
-                    "reason": hf.explanation
+                    "claim": self.claim_verifications[i].claim,
+                    "script_context": self.claim_verifications[i].script_context,
+                    "reason": self.claim_verifications[i].explanation
                 }
-                for hf in self.hallucination_flags
+                for i in self.hallucination_flag_ids
             ],
-            "coverage_analysis": [
-                {
-                    "section": ci.section,
-                    "status": ci.status,
-                    "key_points_total": ci.key_points_total,
-                    "key_points_covered": ci.key_points_covered,
-                    "covered": ci.covered,
-                    "omitted": ci.omitted
-                }
-                for ci in self.coverage_analysis
-            ]
+            "coverage_analysis": coverage_analysis
         }
 
 
+def _report_default(obj):
+    """orjson fallback: emit a verifier model as its fields, in declaration order."""
+    if isinstance(obj, (ClaimVerification, CoverageItem)):
+        fields = dict(obj)
+        fields["status"] = obj.status.name
+        return fields
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
 # ============================================================================
 # Configuration Models
 # ============================================================================
 
 class SectionConfig(BaseModel):
     """Configuration for a section to extract."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     name: str = Field(description="Section name")
-    pages: List[int] = Field(description="Page numbers to extract (1-indexed)")
+    pages: list[int] = Field(description="Page numbers to extract (1-indexed)")
 
 
 class DocumentConfig(BaseModel):
     """Configuration for the document."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     path: str = Field(description="Path to the PDF file")
     title: str = Field(description="Document title")
 
 
 class Config(BaseModel):
     """Complete configuration."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     document: DocumentConfig = Field(description="Document configuration")
-    sections: List[SectionConfig] = Field(description="Sections to extract")
+    sections: list[SectionConfig] = Field(description="Sections to extract")
@@ -3,12 +3,134 @@ PDF Utilities
 
 Utilities for handling PDF documents including compression and optimization.
 """
+from __future__ import annotations
+
+import hashlib
+import logging
+import multiprocessing
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+# pymupdf loads the MuPDF shared library (tens of MB); it is imported inside
+# the functions that open documents so importing this module stays cheap
+if TYPE_CHECKING:
+    import pymupdf
+
+from .cache import make_key
+
+# Messages use %-style arguments so they are only formatted when a handler
+# actually emits them; the CLI configures logging to show INFO on stdout
+logger = logging.getLogger(__name__)
+
+# Cap on worker processes for page rendering; beyond ~4 workers the
+# per-process startup cost outweighs the layout-analysis speedup
+MAX_RENDER_WORKERS = 4
 
-import pymupdf
+# Starting a render worker (spawn plus importing pymupdf/pymupdf4llm) costs
+# ~0.7 s and layout analysis ~0.18 s per page, so even with 2 workers a
+# pool only pays off once a document renders this many pages in total
+PARALLEL_RENDER_MIN_PAGES = 8
+
+# Inputs below this size are read into memory before opening, bypassing
+# MuPDF's file I/O layer during the full rewrite
+MAX_IN_MEMORY_OPEN_BYTES = 512 * 1024 * 1024
+
+# Opt-in cache of compressed outputs, keyed by input content and options, so
+# re-running on an unchanged PDF copies the previous result. Least recently
+# used entries are pruned once the directory exceeds MAX_COMPRESSED_CACHE_BYTES;
+# deleting the directory clears it
+COMPRESSED_CACHE_DIR = Path.home() / ".cache" / "pdftopod" / "compressed"
+MAX_COMPRESSED_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def _file_digest(path: Path) -> tuple[str, int]:
+    """
+    Hash a file's contents in one streaming pass.
+
+    Returns:
+        Tuple of (hex digest, file size in bytes)
+    """
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+: read loop runs in C
+            digest = hashlib.file_digest(f, "blake2b")
+        else:
+            digest = hashlib.blake2b()
+            while chunk := f.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+        return digest.hexdigest(), f.tell()
+
+
+def _store_in_cache(source: Path, cached_path: Path, max_bytes: int = MAX_COMPRESSED_CACHE_BYTES) -> None:
+    """Copy a compressed output into the cache, replacing any entry atomically."""
+    cached_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached_path.with_suffix(f".{os.getpid()}.tmp")
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, cached_path)
+    _prune_cache(cached_path.parent, max_bytes)
+
+
+def _prune_cache(cache_dir: Path, max_bytes: int) -> None:
+    """Delete the least recently used cached outputs until the rest fit in max_bytes."""
+    entries = []
+    for path in cache_dir.glob("*.pdf"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # removed by a concurrent prune
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _is_compact(doc: pymupdf.Document) -> bool:
+    """
+    Check whether a PDF is already compressed.
+
+    A file counts as compact when every stream already has a filter, its
+    small objects are packed into object streams, and its xref table has no
+    free entries left behind by deleted objects. compress_pdf's own output
+    (garbage-collected, deflated, saved with use_objstms) meets all three,
+    so compressing it again is skipped. Only dictionary keys and object
+    headers are read, never stream contents.
+    """
+    has_object_streams = False
+    for xref in range(1, doc.xref_length()):
+        if doc.xref_is_stream(xref):
+            if doc.xref_get_key(xref, "Filter")[0] == "null":
+                return False
+            if doc.xref_get_key(xref, "Type")[1] == "/ObjStm":
+                has_object_streams = True
+        elif doc.xref_object(xref, compressed=True) == "null":
+            return False
+    return has_object_streams
+
+
+# Embedded font program subtypes (FontFile3); FontFile/FontFile2 streams
+# have no subtype and are recognised by their Length1 entry instead
+FONT_STREAM_SUBTYPES = {"/Type1C", "/CIDFontType0C", "/OpenType"}
+
+
+def _unfiltered_stream_kinds(doc: pymupdf.Document) -> set[str]:
+    """Return the kinds of stream ("image", "font") that have at least one uncompressed stream."""
+    kinds = set()
+    for xref in range(1, doc.xref_length()):
+        if not doc.xref_is_stream(xref) or doc.xref_get_key(xref, "Filter")[0] != "null":
+            continue
+        subtype = doc.xref_get_key(xref, "Subtype")[1]
+        if subtype == "/Image":
+            kinds.add("image")
+        elif subtype in FONT_STREAM_SUBTYPES or doc.xref_get_key(xref, "Length1")[0] != "null":
+            kinds.add("font")
+    return kinds
 
 
 def compress_pdf(
@@ -18,7 +140,12 @@ def compress_pdf(
     deflate: bool = True,
     deflate_images: bool = True,
     deflate_fonts: bool = True,
-    clean: bool = True
+    clean: bool = True,
+    doc: Optional[pymupdf.Document] = None,
+    skip_if_compact: bool = True,
+    smart: bool = False,
+    cache_dir: Optional[Path] = None,
+    _size_bytes: Optional[int] = None
 ) -> str:
     """
     Compress a PDF file to reduce its size.
@@ -41,14 +168,36 @@ def compress_pdf(
         deflate_images: Enable deflate compression for images
         deflate_fonts: Enable deflate compression for fonts
         clean: Clean and sanitize the PDF
+        doc: Already-open Document for input_path; it is left open for the
+             caller instead of being opened and closed here
+        skip_if_compact: Return input_path unchanged when the file is
+             already compressed (see _is_compact)
+        smart: Only deflate images/fonts if some of them are stored
+             uncompressed; re-deflating JPEG or already-deflated streams
+             costs CPU for no size reduction
+        cache_dir: Directory of previously compressed outputs, keyed by a
+             hash of the input bytes and these options, e.g.
+             COMPRESSED_CACHE_DIR (default: no cache, and no hashing pass)
+        _size_bytes: Input file size if the caller already stat'ed it
 
     Returns:
-        Path to the compressed PDF file
+        Path to the compressed PDF file, or input_path if it was skipped
     """
+    import pymupdf
+
     input_path = Path(input_path)
 
-    if not input_path.exists():
-        raise FileNotFoundError(f"Input PDF not found: {input_path}")
+    # One stat (or, with the cache enabled, the hashing pass) both checks
+    # existence and gives the original size
+    digest = None
+    try:
+        if cache_dir is not None:
+            digest, _size_bytes = _file_digest(input_path)
+        elif _size_bytes is None:
+            _size_bytes = input_path.stat().st_size
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Input PDF not found: {input_path}") from None
+    original_size = _size_bytes
 
     # Default output path
     if output_path is None:
@@ -56,38 +205,136 @@ def compress_pdf(
     else:
         output_path = Path(output_path)
 
-    # Get original size
-    original_size = input_path.stat().st_size
-
-    print(f"[PDF Utils] Compressing: {input_path}")
-    print(f"[PDF Utils] Original size: {original_size / 1024 / 1024:.2f} MB")
+    logger.info("[PDF Utils] Compressing: %s", input_path)
+    logger.info("[PDF Utils] Original size: %.2f MB", original_size / 1024 / 1024)
+
+    cached_path = None
+    if digest is not None:
+        cache_key = make_key(
+            digest,
+            f"garbage={garbage} deflate={deflate} images={deflate_images} fonts={deflate_fonts} "
+            f"clean={clean} smart={smart}"
+        )
+        cached_path = Path(cache_dir) / f"{cache_key}.pdf"
+        if cached_path.exists():
+            shutil.copyfile(cached_path, output_path)
+            os.utime(cached_path)  # mark as recently used for pruning
+            logger.info("[PDF Utils] Reused cached compressed output: %s", output_path)
+            return str(output_path)
 
     # Open and save with compression
-    doc = pymupdf.open(str(input_path))
-
-    # Save with optimization options
-    doc.save(
-        str(output_path),
-        garbage=garbage,
-        deflate=deflate,
-        deflate_images=deflate_images,
-        deflate_fonts=deflate_fonts,
-        clean=clean
-    )
-
-    doc.close()
+    owns_doc = doc is None
+    if owns_doc:
+        if original_size < MAX_IN_MEMORY_OPEN_BYTES:
+            doc = pymupdf.open(stream=input_path.read_bytes(), filetype="pdf")
+        else:
+            doc = pymupdf.open(str(input_path))
+
+    try:
+        if skip_if_compact and _is_compact(doc):
+            logger.info("[PDF Utils] PDF is already compressed, skipping")
+            return str(input_path)
+
+        if smart and (deflate_images or deflate_fonts):
+            kinds = _unfiltered_stream_kinds(doc)
+            deflate_images = deflate_images and "image" in kinds
+            deflate_fonts = deflate_fonts and "font" in kinds
+            logger.info("[PDF Utils] Deflating images: %s, fonts: %s", deflate_images, deflate_fonts)
+
+        # Save with optimization options; object streams pack the many small
+        # non-stream objects that deflate alone cannot shrink
+        doc.save(
+            str(output_path),
+            garbage=garbage,
+            deflate=deflate,
+            deflate_images=deflate_images,
+            deflate_fonts=deflate_fonts,
+            clean=clean,
+            use_objstms=1,
+            pretty=0
+        )
+    finally:
+        if owns_doc:
+            doc.close()
+
+    if cached_path is not None:
+        _store_in_cache(output_path, cached_path)
 
     # Get compressed size
     compressed_size = output_path.stat().st_size
     reduction = (1 - compressed_size / original_size) * 100
 
-    print(f"[PDF Utils] Compressed size: {compressed_size / 1024 / 1024:.2f} MB")
-    print(f"[PDF Utils] Size reduction: {reduction:.1f}%")
-    print(f"[PDF Utils] Output: {output_path}")
+    logger.info("[PDF Utils] Compressed size: %.2f MB", compressed_size / 1024 / 1024)
+    logger.info("[PDF Utils] Size reduction: %.1f%%", reduction)
+    logger.info("[PDF Utils] Output: %s", output_path)
 
     return str(output_path)
 
 
+class PdfSession:
+    """
+    One open Document shared by the info, compression and extraction helpers.
+
+    Each pymupdf.open() parses the xref table and metadata again, so work
+    on the same file (e.g. info then compress in --compress mode) should go
+    through one session rather than the free functions.
+
+    Usage:
+        with PdfSession(path) as session:
+            print(session.info())
+            session.compress()
+    """
+
+    def __init__(self, pdf_path: str):
+        self.path = pdf_path
+        self.doc: Optional[pymupdf.Document] = None
+        self._size: Optional[int] = None
+
+    def __enter__(self) -> "PdfSession":
+        import pymupdf
+        self.doc = pymupdf.open(self.path)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.doc.close()
+
+    @property
+    def size_bytes(self) -> int:
+        """File size in bytes (read from disk once)."""
+        if self._size is None:
+            self._size = os.stat(self.path).st_size
+        return self._size
+
+    @property
+    def size_mb(self) -> float:
+        """File size in MB."""
+        return self.size_bytes / 1024 / 1024
+
+    def info(self) -> dict:
+        """Get information about the PDF (see get_pdf_info)."""
+        metadata = self.doc.metadata
+        return {
+            "path": self.path,
+            "file_size_mb": self.size_mb,
+            "page_count": len(self.doc),
+            "title": metadata.get("title", ""),
+            "author": metadata.get("author", ""),
+            "subject": metadata.get("subject", ""),
+            "creator": metadata.get("creator", ""),
+            "producer": metadata.get("producer", ""),
+            "is_encrypted": self.doc.is_encrypted,
+            "is_pdf": self.doc.is_pdf,
+        }
+
+    def compress(self, output_path: Optional[str] = None, **options) -> str:
+        """Compress the PDF using the open Document (see compress_pdf for options)."""
+        return compress_pdf(self.path, output_path, doc=self.doc, _size_bytes=self.size_bytes, **options)
+
+    def extract(self, output_path: str, pages: list[int]) -> str:
+        """Extract pages into a new file using the open Document (see extract_pages)."""
+        return extract_pages(self.path, output_path, pages, doc=self.doc)
+
+
 def get_pdf_info(pdf_path: str) -> dict:
     """
     Get information about a PDF file.
@@ -98,87 +345,204 @@ def get_pdf_info(pdf_path: str) -> dict:
     Returns:
         Dictionary with PDF information
     """
-    doc = pymupdf.open(pdf_path)
+    with PdfSession(pdf_path) as session:
+        return session.info()
 
-    info = {
-        "path": pdf_path,
-        "file_size_mb": os.path.getsize(pdf_path) / 1024 / 1024,
-        "page_count": len(doc),
-        "title": doc.metadata.get("title", ""),
-        "author": doc.metadata.get("author", ""),
-        "subject": doc.metadata.get("subject", ""),
-        "creator": doc.metadata.get("creator", ""),
-        "producer": doc.metadata.get("producer", ""),
-        "is_encrypted": doc.is_encrypted,
-        "is_pdf": doc.is_pdf,
-    }
 
-    doc.close()
-    return info
+def _page_runs(pages: list[int]) -> list[tuple[int, int]]:
+    """Collapse pages into (start, end) runs of consecutive numbers, keeping their order."""
+    runs = []
+    for page in pages:
+        if runs and page == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
 
 
 def extract_pages(
     input_path: str,
     output_path: str,
-    pages: list[int]
+    pages: list[int],
+    doc: Optional[pymupdf.Document] = None
 ) -> str:
     """
     Extract specific pages from a PDF into a new file.
 
+    Consecutive pages are copied with one insert_pdf call per run rather
+    than one per page, since every call walks the input's object graph.
+
     Args:
         input_path: Path to the input PDF
         output_path: Path for the extracted pages PDF
-        pages: List of page numbers to extract (1-indexed)
+        pages: List of page numbers to extract (1-indexed), in output order
+        doc: Already-open Document for input_path; it is left open and
+             unmodified for the caller
 
     Returns:
         Path to the output PDF
     """
-    input_doc = pymupdf.open(input_path)
-    output_doc = pymupdf.open()
+    import pymupdf
+
+    owns_doc = doc is None
+    input_doc = pymupdf.open(input_path) if owns_doc else doc
+    page_count = len(input_doc)
+
+    valid_pages = [p for p in pages if 0 < p <= page_count]
+    if len(valid_pages) != len(pages):
+        out_of_range = [p for p in pages if not 0 < p <= page_count]
+        logger.warning("[PDF Utils] Warning: Page(s) %s out of range", ", ".join(map(str, out_of_range)))
+
+    all_pages = list(range(1, page_count + 1))
+    if valid_pages == all_pages:
+        # Every page in its original order: the input already is the output
+        shutil.copyfile(input_path, output_path)
+    elif owns_doc and sorted(valid_pages) == all_pages:
+        # Every page, reordered: rearrange our private copy in place
+        input_doc.select([p - 1 for p in valid_pages])
+        input_doc.save(output_path, garbage=1)
+    else:
+        output_doc = pymupdf.open()
+        for start, end in _page_runs(valid_pages):
+            output_doc.insert_pdf(input_doc, from_page=start - 1, to_page=end - 1)
+        output_doc.save(output_path)
+        output_doc.close()
+
+    if owns_doc:
+        input_doc.close()
+
+    logger.info("[PDF Utils] Extracted %d pages to: %s", len(valid_pages), output_path)
+    return output_path
+
+
+def _render_pages_markdown(pdf_path: str, page_indices: list[int]) -> list[str]:
+    """Worker: render pages to markdown with a Document private to this process."""
+    import pymupdf
+    import pymupdf4llm
+
+    doc = pymupdf.open(pdf_path)
+    try:
+        chunks = pymupdf4llm.to_markdown(doc, pages=page_indices, page_chunks=True)
+        return [chunk["text"] for chunk in chunks]
+    finally:
+        doc.close()
+
+
+def default_render_workers() -> int:
+    """Worker processes to render pages with: min(CPU count, MAX_RENDER_WORKERS)."""
+    return min(os.cpu_count() or 1, MAX_RENDER_WORKERS)
+
+
+def render_pool(num_workers: int) -> ProcessPoolExecutor:
+    """
+    Start a pool of page-rendering processes.
+
+    Create one per document and pass it to every pages_to_markdown_parallel
+    call, so the spawn and import cost is paid once rather than per section.
+    """
+    # "spawn" avoids forking a parent that may hold open MuPDF state
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=num_workers, mp_context=context)
+
 
-    for page_num in pages:
-        page_idx = page_num - 1  # Convert to 0-indexed
-        if 0 <= page_idx < len(input_doc):
-            output_doc.insert_pdf(input_doc, from_page=page_idx, to_page=page_idx)
+def pages_to_markdown_parallel(
+    pdf_path: str,
+    page_indices: list[int],
+    num_workers: Optional[int] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    doc: Optional[pymupdf.Document] = None
+) -> dict[int, str]:
+    """
+    Render PDF pages to markdown across worker processes.
+
+    pymupdf4llm layout analysis is CPU-bound and holds the GIL, so pages are
+    split into contiguous runs rendered in separate processes. Each worker
+    opens its own Document, since Document objects cannot be shared. With a
+    single worker the pages are rendered in this process instead, since a
+    lone child only adds its startup cost.
+
+    Args:
+        pdf_path: Path to the PDF file
+        page_indices: Page indices to render (0-indexed)
+        num_workers: Worker processes (default: default_render_workers());
+             pass the pool's size together with executor
+        executor: Pool from render_pool() to reuse (default: a pool for this call)
+        doc: Already-open Document for pdf_path, used for in-process rendering
+
+    Returns:
+        Mapping of page index to markdown text
+    """
+    indices = sorted(set(page_indices))
+    if num_workers is None:
+        num_workers = default_render_workers()
+    num_workers = max(1, min(num_workers, len(indices)))
+
+    if num_workers == 1:
+        if doc is None:
+            texts = _render_pages_markdown(pdf_path, indices)
         else:
-            print(f"[PDF Utils] Warning: Page {page_num} out of range")
+            import pymupdf4llm
 
-    output_doc.save(output_path)
-    output_doc.close()
-    input_doc.close()
+            chunks = pymupdf4llm.to_markdown(doc, pages=indices, page_chunks=True)
+            texts = [chunk["text"] for chunk in chunks]
+        return dict(zip(indices, texts))
 
-    print(f"[PDF Utils] Extracted {len(pages)} pages to: {output_path}")
-    return output_path
+    # Contiguous runs keep neighbouring pages in the same worker
+    run_size = -(-len(indices) // num_workers)
+    runs = [indices[i:i + run_size] for i in range(0, len(indices), run_size)]
+
+    if executor is None:
+        with render_pool(len(runs)) as executor:
+            return pages_to_markdown_parallel(pdf_path, indices, len(runs), executor)
+
+    results = executor.map(_render_pages_markdown, [pdf_path] * len(runs), runs)
+    return {
+        idx: text
+        for run, texts in zip(runs, results)
+        for idx, text in zip(run, texts)
+    }
 
 
 def auto_compress_if_large(
     pdf_path: str,
-    threshold_mb: float = 10.0
-) -> str:
+    threshold_mb: float = 10.0,
+    cache_dir: Optional[Path] = None
+) -> tuple[str, pymupdf.Document]:
     """
     Automatically compress a PDF if it exceeds a size threshold.
 
+    The PDF is parsed once: the Document used for compression is returned
+    open (its content matches the compressed file), so callers do not have
+    to re-open the output.
+
     Args:
         pdf_path: Path to the PDF file
         threshold_mb: Size threshold in MB above which to compress
+        cache_dir: Compressed output cache directory (see compress_pdf)
 
     Returns:
-        Path to the (possibly compressed) PDF
+        Tuple of (path to the possibly compressed PDF, open Document); the
+        caller is responsible for closing the Document
     """
-    size_mb = os.path.getsize(pdf_path) / 1024 / 1024
+    import pymupdf
+
+    size_bytes = os.stat(pdf_path).st_size
+    size_mb = size_bytes / 1024 / 1024
+    doc = pymupdf.open(pdf_path)
 
     if size_mb > threshold_mb:
-        print(f"[PDF Utils] PDF size ({size_mb:.1f} MB) exceeds threshold ({threshold_mb} MB)")
-        print(f"[PDF Utils] Compressing automatically...")
-        return compress_pdf(pdf_path)
+        logger.info("[PDF Utils] PDF size (%.1f MB) exceeds threshold (%s MB)", size_mb, threshold_mb)
+        logger.info("[PDF Utils] Compressing automatically...")
+        return compress_pdf(pdf_path, doc=doc, smart=True, cache_dir=cache_dir, _size_bytes=size_bytes), doc
     else:
-        print(f"[PDF Utils] PDF size ({size_mb:.1f} MB) within threshold, no compression needed")
-        return pdf_path
+        logger.info("[PDF Utils] PDF size (%.1f MB) within threshold, no compression needed", size_mb)
+        return pdf_path, doc
 
 
 if __name__ == "__main__":
     # CLI for standalone usage
     import argparse
+    import sys
 
     parser = argparse.ArgumentParser(description="PDF compression utility")
     parser.add_argument("input", help="Input PDF file")
@@ -187,6 +551,11 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
     if args.info:
         info = get_pdf_info(args.input)
         print("\nPDF Information:")
@@ -8,6 +8,71 @@ PROMPT ITERATION HISTORY:
 This file documents the evolution of prompts through development.
 See inline comments for iteration notes and dead ends.
 """
+import string
+
+__all__ = [
+    "PromptTemplate",
+    "KEY_POINTS_SYSTEM",
+    "KEY_POINTS_USER_TEMPLATE",
+    "EXTRACT_AND_PLAN_SYSTEM",
+    "EXTRACT_AND_PLAN_USER_TEMPLATE",
+    "EXTRACT_AND_PLAN_SECTION_TEMPLATE",
+    "PODCAST_PLANNING_SYSTEM",
+    "PODCAST_PLANNING_USER_TEMPLATE",
+    "DIALOGUE_GENERATION_SYSTEM",
+    "DIALOGUE_GENERATION_USER_TEMPLATE",
+    "CLAIM_EXTRACTION_PROMPT",
+    "CLAIM_VERIFICATION_PROMPT",
+    "COVERAGE_ANALYSIS_PROMPT",
+    "BATCH_CLAIM_VERIFICATION_SYSTEM",
+    "BATCH_CLAIM_VERIFICATION_USER_TEMPLATE",
+    "BATCH_COVERAGE_ANALYSIS_SYSTEM",
+    "BATCH_COVERAGE_ANALYSIS_USER_TEMPLATE",
+    "CLAIMS_AND_COVERAGE_SYSTEM",
+    "CLAIMS_AND_COVERAGE_USER_TEMPLATE",
+]
+
+
+class PromptTemplate:
+    """
+    A prompt template parsed once, at import.
+
+    Placeholders use string.Template syntax ($name or ${name}; $$ is a
+    literal dollar sign). Braces carry no meaning, so the JSON examples in
+    the prompts are written as-is instead of doubled into {{ }}. Templates
+    are split into literal/placeholder parts up front, and format() only
+    joins them, instead of re-scanning the text on every call.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._parts = []
+        literal_start = 0
+        literal = ""
+        for match in string.Template.pattern.finditer(template):
+            literal += template[literal_start:match.start()]
+            literal_start = match.end()
+            if match.group("escaped") is not None:
+                literal += "$"
+                continue
+            field = match.group("named") or match.group("braced")
+            if field is None:
+                raise ValueError(f"Invalid placeholder in prompt template at offset {match.start()}")
+            self._parts.append((literal, field))
+            literal = ""
+        self._parts.append((literal + template[literal_start:], None))
+        self.fields = frozenset(field for _, field in self._parts if field)
+
+    def format(self, **values) -> str:
+        """Fill in the placeholders; raises KeyError for a missing value."""
+        return "".join(
+            literal + str(values[field]) if field else literal
+            for literal, field in self._parts
+        )
+
+    def __str__(self) -> str:
+        return self.template
+
 
 # ============================================================================
 # EXTRACTOR PROMPTS
@@ -19,15 +84,43 @@ See inline comments for iteration notes and dead ends.
 # - v3: Added 3-7 limit and "MUST understand" framing -> optimal output
 # - DEAD END: Tried asking for "quotes with context" -> quotes were too long
 #
-KEY_POINTS_EXTRACTION_PROMPT = """You are an expert analyst extracting key points from a corporate document.
+# Prompts are split into a static system block (marked for Anthropic prompt
+# caching) and a user template holding only the per-call fields.
+#
+KEY_POINTS_SYSTEM = """You are an expert analyst extracting key points from a corporate document.
 
-Given the following text from a section titled "{section_name}" (pages {pages}):
+You will be given the text of one document section. Extract the KEY POINTS that a reader MUST understand from this section. Focus on:
+- **Facts**: Numbers, metrics, revenue figures, growth percentages, market share
+- **Strategy**: Strategic decisions, stated intentions, future plans
+- **Market**: Market assessments, industry trends, competitive position
+- **Context**: Important background, challenges, or explanations
+
+For each key point:
+1. Summarize the point concisely (1-2 sentences)
+2. Categorize it as: fact, strategy, market, or context
+3. Include the EXACT quote from the text that supports it
+4. Note the page number
+
+Record your key points with the record_key_points tool. Each "page" must be the page number from the [Page N] marker that precedes the quoted text.
+
+Extract 3-7 key points per section. Focus on what's MOST important for someone to understand the business."""
+
+KEY_POINTS_USER_TEMPLATE = PromptTemplate("""Given the following text from a section titled "${section_name}" (pages ${pages}):
 
 <document_text>
-{text}
-</document_text>
+${text}
+</document_text>""")
 
-Extract the KEY POINTS that a reader MUST understand from this section. Focus on:
+
+# Single-pass variant for small documents: key points for every section and
+# the podcast plan come back from one call instead of N extraction calls plus
+# a planning call. The instructions mirror KEY_POINTS_SYSTEM and
+# PODCAST_PLANNING_SYSTEM; keep them in sync when either changes.
+EXTRACT_AND_PLAN_SYSTEM = """You are an expert analyst preparing a 10-minute two-host educational podcast episode about a corporate document.
+
+You will be given the text of every document section. Work in two steps.
+
+STEP 1 - For EACH section, extract the KEY POINTS that a reader MUST understand from it. Focus on:
 - **Facts**: Numbers, metrics, revenue figures, growth percentages, market share
 - **Strategy**: Strategic decisions, stated intentions, future plans
 - **Market**: Market assessments, industry trends, competitive position
@@ -37,21 +130,31 @@ For each key point:
 1. Summarize the point concisely (1-2 sentences)
 2. Categorize it as: fact, strategy, market, or context
 3. Include the EXACT quote from the text that supports it
-4. Note the page number
+4. Note the page number from the [Page N] marker that precedes the quoted text
 
-Return your response as a JSON object with this structure:
-{{
-    "key_points": [
-        {{
-            "point": "Summary of the key point",
-            "category": "fact|strategy|market|context",
-            "source_quote": "Exact quote from the document",
-            "page": page_number
-        }}
-    ]
-}}
+Extract 3-7 key points per section. Focus on what's MOST important for someone to understand the business.
 
-Extract 3-7 key points per section. Focus on what's MOST important for someone to understand the business."""
+STEP 2 - Plan the podcast episode from those key points.
+
+HOSTS:
+- **Alex**: The enthusiastic explainer. Good at analogies and making complex topics accessible. Asks clarifying questions like "right?" or "you know what I mean?"
+- **Jordan**: The thoughtful skeptic. Pushes back on claims, asks tough questions, plays devil's advocate. Says things like "But wait..." or "I'm not sure I buy that..."
+
+Create a podcast plan that:
+1. Opens with a HOOK that grabs attention (why should listeners care?)
+2. Covers ALL the key points across 3-4 segments
+3. Includes ONE clear FRICTION MOMENT where Jordan pushes back or disagrees with something
+4. Ends with a clear TAKEAWAY ("so what" moment - what should listeners remember?)
+
+Record both with the record_extraction_and_plan tool. "sections" must contain exactly one entry per section, in the order the sections were given."""
+
+EXTRACT_AND_PLAN_USER_TEMPLATE = PromptTemplate("""DOCUMENT: ${document_title}
+
+${sections}""")
+
+EXTRACT_AND_PLAN_SECTION_TEMPLATE = PromptTemplate("""<section index="${index}" name="${section_name}" pages="${pages}">
+${text}
+</section>""")
 
 
 # ============================================================================
@@ -64,16 +167,13 @@ Extract 3-7 key points per section. Focus on what's MOST important for someone t
 # - v3: Added explicit friction_moment field -> ensures conflict is planned, not accidental
 # - DEAD END: Tried detailed segment timings -> too rigid, hurt natural flow
 #
-PODCAST_PLANNING_PROMPT = """You are planning a 10-minute two-host educational podcast episode about a corporate document.
-
-DOCUMENT: {document_title}
+PODCAST_PLANNING_SYSTEM = """You are planning a 10-minute two-host educational podcast episode about a corporate document.
 
 HOSTS:
 - **Alex**: The enthusiastic explainer. Good at analogies and making complex topics accessible. Asks clarifying questions like "right?" or "you know what I mean?"
 - **Jordan**: The thoughtful skeptic. Pushes back on claims, asks tough questions, plays devil's advocate. Says things like "But wait..." or "I'm not sure I buy that..."
 
-KEY POINTS TO COVER (extracted from the document):
-{key_points}
+You will be given the document title and the key points extracted from it.
 
 Create a podcast plan that:
 1. Opens with a HOOK that grabs attention (why should listeners care?)
@@ -81,20 +181,13 @@ Create a podcast plan that:
 3. Includes ONE clear FRICTION MOMENT where Jordan pushes back or disagrees with something
 4. Ends with a clear TAKEAWAY ("so what" moment - what should listeners remember?)
 
-Return your response as a JSON object:
-{{
-    "title": "Catchy episode title",
-    "opening_hook": "The hook that grabs attention in the first 30 seconds",
-    "segments": [
-        {{
-            "title": "Segment title",
-            "key_points_to_cover": ["point 1", "point 2"],
-            "approach": "How Alex and Jordan will discuss this"
-        }}
-    ],
-    "friction_moment": "Describe the specific moment where Jordan pushes back and why",
-    "takeaway": "The clear 'so what' message listeners should remember"
-}}"""
+Record the plan with the record_plan tool."""
+
+
+PODCAST_PLANNING_USER_TEMPLATE = PromptTemplate("""DOCUMENT: ${document_title}
+
+KEY POINTS TO COVER (extracted from the document):
+${key_points}""")
 
 
 # ITERATION HISTORY - Dialogue Prompt:
@@ -109,13 +202,7 @@ Return your response as a JSON object:
 # - FIX: Changed to "lightweight" cues: [laughs], [thoughtful], [skeptical]
 # - KEY INSIGHT: LLMs don't reliably follow length constraints in prompts alone - need programmatic check
 #
-DIALOGUE_GENERATION_PROMPT = """Write a natural two-host podcast dialogue based on this plan.
-
-EPISODE PLAN:
-{plan}
-
-SOURCE KEY POINTS (with page references):
-{key_points_with_sources}
+DIALOGUE_GENERATION_SYSTEM = """Write a natural two-host podcast dialogue based on the episode plan and source key points you are given.
 
 HOSTS:
 - **Alex**: Enthusiastic explainer. Uses analogies. Natural speech patterns like "you know", "right?", brief reactions.
@@ -140,22 +227,16 @@ REQUIREMENTS:
 - Add natural back-and-forth: clarifying questions, reactions, "wait, really?", "that's interesting"
 - Expand on key statistics and their implications - don't rush through numbers
 
-Return your response as a JSON object:
-{{
-    "title": "Episode title",
-    "dialogue": [
-        {{
-            "speaker": "Alex",
-            "text": "The dialogue text",
-            "emotion_cue": "[optional emotion cue]" or null
-        }}
-    ],
-    "friction_moment_summary": "Brief summary of the friction moment",
-    "takeaway_summary": "Brief summary of the main takeaway"
-}}
+Record the script with the record_script tool. Use "emotion_cue" for the optional bracketed cue and leave it null when there is none.
 
 Start with Alex introducing the topic and make it engaging from the first line!"""
 
+DIALOGUE_GENERATION_USER_TEMPLATE = PromptTemplate("""EPISODE PLAN:
+${plan}
+
+SOURCE KEY POINTS (with page references):
+${key_points_with_sources}""")
+
 
 # ============================================================================
 # VERIFIER PROMPTS
@@ -168,7 +249,7 @@ Start with Alex introducing the topic and make it engaging from the first line!"
 # - DEAD END: Tried semantic similarity with embeddings -> added complexity without benefit
 # - DECISION: LLM-based NLI (natural language inference) is simpler and works well
 #
-CLAIM_EXTRACTION_PROMPT = """Extract all FACTUAL CLAIMS from this podcast script.
+CLAIM_EXTRACTION_PROMPT = PromptTemplate("""Extract all FACTUAL CLAIMS from this podcast script.
 
 A factual claim is:
 - An assertion about business performance, revenue, growth, market share
@@ -183,30 +264,21 @@ A factual claim is NOT:
 - Hypotheticals or speculation clearly marked as such
 
 PODCAST SCRIPT:
-{script}
+${script}
 
-Return a JSON object with extracted claims:
-{{
-    "claims": [
-        {{
-            "claim": "The specific factual claim",
-            "script_context": "The full dialogue line containing this claim",
-            "line_index": index_of_dialogue_line
-        }}
-    ]
-}}
+Record the claims with the record_claims tool. For each claim give the specific factual claim, the full dialogue line containing it as "script_context", and the [N] index of that line as "line_index".
 
-Be thorough but precise - extract only verifiable factual claims."""
+Be thorough but precise - extract only verifiable factual claims.""")
 
 
-CLAIM_VERIFICATION_PROMPT = """Verify if this claim from a podcast script is supported by the source document.
+CLAIM_VERIFICATION_PROMPT = PromptTemplate("""Verify if this claim from a podcast script is supported by the source document.
 
-CLAIM: "{claim}"
+CLAIM: "${claim}"
 
-SCRIPT CONTEXT: "{script_context}"
+SCRIPT CONTEXT: "${script_context}"
 
 SOURCE DOCUMENT SECTIONS:
-{source_sections}
+${source_sections}
 
 Determine if the source document supports this claim.
 
@@ -215,23 +287,23 @@ PARTIALLY_SUPPORTED: The claim is related to source content but adds interpretat
 NOT_FOUND: The claim cannot be traced to any passage in the source
 
 Return a JSON object:
-{{
+{
     "status": "SUPPORTED|PARTIALLY_SUPPORTED|NOT_FOUND",
     "source_page": page_number_if_found_or_null,
     "source_quote": "exact_quote_if_found_or_null",
     "explanation": "Brief explanation of your assessment"
-}}"""
+}""")
 
 
-COVERAGE_ANALYSIS_PROMPT = """Analyze how well the podcast script covers the key points from a document section.
+COVERAGE_ANALYSIS_PROMPT = PromptTemplate("""Analyze how well the podcast script covers the key points from a document section.
 
-SECTION: {section_name}
+SECTION: ${section_name}
 
 KEY POINTS FROM SOURCE:
-{key_points}
+${key_points}
 
 PODCAST SCRIPT:
-{script}
+${script}
 
 For each key point, determine if it was:
 - COVERED: The point is clearly discussed in the podcast
@@ -239,18 +311,18 @@ For each key point, determine if it was:
 - OMITTED: The point is not covered
 
 Return a JSON object:
-{{
-    "section": "{section_name}",
+{
+    "section": "${section_name}",
     "status": "FULL|PARTIAL|OMITTED",
     "key_points_total": total_count,
     "key_points_covered": covered_count,
     "covered": ["list of covered points"],
     "omitted": ["list of omitted points"]
-}}
+}
 
 FULL = all or nearly all key points covered
 PARTIAL = some key points covered, some omitted
-OMITTED = section not meaningfully covered"""
+OMITTED = section not meaningfully covered""")
 
 
 # ============================================================================
@@ -267,60 +339,88 @@ OMITTED = section not meaningfully covered"""
 # These batch prompts replace CLAIM_VERIFICATION_PROMPT and COVERAGE_ANALYSIS_PROMPT
 # for production use. The individual prompts are kept for reference/debugging.
 #
-BATCH_CLAIM_VERIFICATION_PROMPT = """Verify multiple claims from a podcast script against the source document.
-
-CLAIMS TO VERIFY:
-{claims_list}
+# - Split each batch prompt into a system template (instructions + source
+#   document / key points) and a short user template (claims / script). The
+#   system block is identical for every batch in a run, so it is sent with
+#   prompt caching and batches 2..N read it from the cache.
+# - Moved verifier output from fenced JSON to forced tool calls. A stray
+#   sentence around the JSON used to fail the whole batch and mark every
+#   claim NOT_FOUND; tool input is schema-checked and retried instead.
+#
+BATCH_CLAIM_VERIFICATION_SYSTEM = PromptTemplate("""Verify multiple claims from a podcast script against the source document.
 
 SOURCE DOCUMENT:
-{source_sections}
+${source_sections}
 
 For EACH claim, determine:
 - SUPPORTED: Directly stated or clearly implied in source
 - PARTIALLY_SUPPORTED: Related but adds interpretation not in source
 - NOT_FOUND: Cannot be traced to source
 
-Return a JSON object with verification for each claim:
-{{
-    "verifications": [
-        {{
-            "claim_id": 0,
-            "status": "SUPPORTED|PARTIALLY_SUPPORTED|NOT_FOUND",
-            "source_page": page_number_or_null,
-            "source_quote": "brief_supporting_quote_or_null",
-            "explanation": "One sentence explanation"
-        }}
-    ]
-}}
+Record one verification per claim with the record_verifications tool, using the claim's [N] index as "claim_id". Give the supporting page and a brief quote when the claim is supported, or null when it is not.
+
+Be concise but accurate.""")
 
-Be concise but accurate. Verify all {num_claims} claims."""
+BATCH_CLAIM_VERIFICATION_USER_TEMPLATE = PromptTemplate("""CLAIMS TO VERIFY:
+${claims_list}
 
+Verify all ${num_claims} claims.""")
 
-BATCH_COVERAGE_ANALYSIS_PROMPT = """Analyze how well the podcast script covers key points from ALL sections.
+
+BATCH_COVERAGE_ANALYSIS_SYSTEM = PromptTemplate("""Analyze how well the podcast script covers key points from ALL sections.
 
 SECTIONS AND KEY POINTS:
-{all_sections_key_points}
+${all_sections_key_points}
 
-PODCAST SCRIPT:
-{script}
+For EACH section, determine coverage status:
+- FULL: All or nearly all key points covered
+- PARTIAL: Some covered, some omitted
+- OMITTED: Section not meaningfully covered
+
+Record one entry per section with the record_coverage tool, naming each section exactly as it appears above and listing which of its key points were covered and which were omitted.""")
+
+BATCH_COVERAGE_ANALYSIS_USER_TEMPLATE = PromptTemplate("""PODCAST SCRIPT:
+${script}
+
+Analyze all ${num_sections} sections.""")
+
+
+# Fused variant (opt-in): claim extraction and coverage analysis both read the
+# whole script, so one Haiku call returns both and the script is sent once.
+# The key points sit in the cached system block as in the coverage prompt.
+CLAIMS_AND_COVERAGE_SYSTEM = PromptTemplate("""Analyze a podcast script against the key points of the document it was written from. Do two things in one pass.
+
+1. Extract all FACTUAL CLAIMS from the script.
+
+A factual claim is:
+- An assertion about business performance, revenue, growth, market share
+- A statement about strategy, plans, or intentions
+- A market assessment or industry fact
+- Specific numbers, dates, or named entities
+
+A factual claim is NOT:
+- Host opinions or subjective assessments ("I think this is interesting")
+- General framing or transitions ("Let's talk about...")
+- Banter or conversational filler ("Right?", "Exactly!")
+- Hypotheticals or speculation clearly marked as such
+
+For each claim give the specific factual claim, the full dialogue line containing it as "script_context", and the [N] index of that line as "line_index". Be thorough but precise - extract only verifiable factual claims.
+
+2. Analyze how well the script covers the key points of EACH section.
+
+SECTIONS AND KEY POINTS:
+${all_sections_key_points}
 
 For EACH section, determine coverage status:
 - FULL: All or nearly all key points covered
 - PARTIAL: Some covered, some omitted
 - OMITTED: Section not meaningfully covered
 
-Return a JSON object:
-{{
-    "coverage": [
-        {{
-            "section": "Section Name",
-            "status": "FULL|PARTIAL|OMITTED",
-            "key_points_total": N,
-            "key_points_covered": M,
-            "covered": ["point 1", "point 2"],
-            "omitted": ["point 3"]
-        }}
-    ]
-}}
-
-Analyze all {num_sections} sections."""
+Name each section exactly as it appears above and list which of its key points were covered and which were omitted.
+
+Record both results with the record_claims_and_coverage tool.""")
+
+CLAIMS_AND_COVERAGE_USER_TEMPLATE = PromptTemplate("""PODCAST SCRIPT:
+${script}
+
+Extract every factual claim and analyze all ${num_sections} sections.""")
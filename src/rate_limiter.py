@@ -0,0 +1,93 @@
+"""
+Rate Limiting
+
+Thread-safe token buckets shared by agents that issue concurrent Claude calls,
+so parallel workers stay under the account's requests-per-minute and
+input-tokens-per-minute limits, and all of them pause after a 429.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token buckets that gate how many requests and input tokens may start per minute."""
+
+    def __init__(
+        self,
+        requests_per_minute: int = 50,
+        burst: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ):
+        """
+        Args:
+            requests_per_minute: Sustained request rate allowed
+            burst: Maximum requests that may start back-to-back (default: one minute's worth)
+            tokens_per_minute: Sustained input token rate allowed (default: unlimited)
+        """
+        self.capacity = float(burst or requests_per_minute)
+        self.refill_per_second = requests_per_minute / 60.0
+        self._tokens = self.capacity
+
+        self.token_capacity = float(tokens_per_minute) if tokens_per_minute else None
+        self.token_refill_per_second = (tokens_per_minute or 0) / 60.0
+        self._input_tokens = self.token_capacity or 0.0
+
+        self._blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Block until a request slot (and tokens input tokens) is available, then consume it.
+
+        Requests larger than the token bucket are clamped to its capacity so
+        they wait for a full bucket instead of forever.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._updated = now
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+
+                wait = self._blocked_until - now
+                if self.token_capacity is not None:
+                    self._input_tokens = min(
+                        self.token_capacity,
+                        self._input_tokens + elapsed * self.token_refill_per_second
+                    )
+                    needed = min(float(tokens), self.token_capacity)
+                    if self._input_tokens < needed:
+                        wait = max(wait, (needed - self._input_tokens) / self.token_refill_per_second)
+                else:
+                    needed = 0.0
+
+                if self._tokens < 1:
+                    wait = max(wait, (1 - self._tokens) / self.refill_per_second)
+
+                if wait <= 0:
+                    self._tokens -= 1
+                    self._input_tokens -= needed
+                    return
+
+            time.sleep(wait)
+
+    def release(self, tokens: int) -> None:
+        """Return input tokens reserved by acquire() that the request did not count against the limit."""
+        if self.token_capacity is None:
+            return
+        with self._lock:
+            self._input_tokens = min(self.token_capacity, self._input_tokens + tokens)
+
+    def backoff(self, seconds: float) -> None:
+        """Hold every caller for the given number of seconds, e.g. after a 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def __enter__(self) -> "RateLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
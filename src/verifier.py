@@ -5,40 +5,96 @@ Verifies podcast script accuracy against source document.
 Uses batching and Haiku model to minimize API costs.
 
 Cost optimizations:
-- Batch claim verification (10-15 claims per call instead of 1)
+- Batch claim verification (claims packed up to a token budget per call instead of 1)
+- Verification batches run concurrently under a shared rate limiter
 - Batch coverage analysis (all sections in 1 call)
 - Use Haiku for verification tasks (10x cheaper than Sonnet)
 """
-import json
-from typing import List
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import accumulate
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-import anthropic
+from pydantic import ValidationError
 
 from .models import (
     ExtractedDocument,
+    SectionContent,
     PodcastScript,
     ExtractedClaim,
+    ClaimExtraction,
+    ClaimVerdict,
+    BatchVerification,
+    CoverageAnalysis,
+    ClaimsAndCoverage,
+    SectionCoverage,
     ClaimVerification,
     CoverageItem,
+    CoverageStatus,
     VerificationReport,
+    VerificationStatus,
 )
+from .cache import ResponseCache, make_key
+from .llm import StructuredOutputError, cached_system, request_structured, tool_for
+from .rate_limiter import RateLimiter
 from .prompts import (
     CLAIM_EXTRACTION_PROMPT,
-    BATCH_CLAIM_VERIFICATION_PROMPT,
-    BATCH_COVERAGE_ANALYSIS_PROMPT,
+    BATCH_CLAIM_VERIFICATION_SYSTEM,
+    BATCH_CLAIM_VERIFICATION_USER_TEMPLATE,
+    BATCH_COVERAGE_ANALYSIS_SYSTEM,
+    BATCH_COVERAGE_ANALYSIS_USER_TEMPLATE,
+    CLAIMS_AND_COVERAGE_SYSTEM,
+    CLAIMS_AND_COVERAGE_USER_TEMPLATE,
 )
 
+if TYPE_CHECKING:
+    import anthropic
+
 # Model selection for cost optimization
 EXTRACTION_MODEL = "claude-sonnet-4-20250514"  # Sonnet for claim extraction (needs accuracy)
 VERIFICATION_MODEL = "claude-haiku-4-5-20251001"  # Haiku for verification (cheaper, still accurate)
-BATCH_SIZE = 15  # Claims per verification batch
+MAX_CLAIMS_PER_BATCH = 64  # Claims per verification call, at most
+MAX_BATCH_INPUT_TOKENS = 150_000  # Input budget per verification call, source block included
+CHARS_PER_TOKEN = 4  # Rough estimate used when packing batches
+OUTPUT_TOKENS_PER_CLAIM = 128  # Output budget per claim's verification entry
+VERIFICATION_TOOL = "record_verifications"
+RAW_EXCERPT_CHARS = 1500  # Raw text sent for sections without key points
+BATCH_POLL_INITIAL_SECONDS = 5.0  # First wait before polling a Message Batch
+BATCH_POLL_MAX_SECONDS = 60.0  # Cap on the exponential polling backoff
+BATCH_MAX_WAIT_SECONDS = 60 * 60.0  # Give up on a Message Batch (and verify synchronously) after this
+
+NO_RESULT_EXPLANATION = "No verification returned"
+BATCH_FAILED_EXPLANATION = "Batch verification failed"
+UNVERIFIED_EXPLANATIONS = (NO_RESULT_EXPLANATION, BATCH_FAILED_EXPLANATION)
 
 
 class VerifierAgent:
     """Agent responsible for verifying podcast script accuracy."""
 
-    def __init__(self, anthropic_client: anthropic.Anthropic):
+    def __init__(
+        self,
+        anthropic_client: "anthropic.Anthropic",
+        max_concurrency: int = 8,
+        rate_limiter: Optional[RateLimiter] = None,
+        use_batch_api: bool = False,
+        max_claims_per_batch: int = MAX_CLAIMS_PER_BATCH,
+        fuse_extraction_and_coverage: bool = False,
+        cache: Optional[ResponseCache] = None,
+        report_cache: Optional[ResponseCache] = None
+    ):
         self.client = anthropic_client
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.use_batch_api = use_batch_api
+        self.max_claims_per_batch = max_claims_per_batch
+        self.fuse_extraction_and_coverage = fuse_extraction_and_coverage
+        self.cache = cache
+        self.report_cache = report_cache
+        # Set when any step falls back to placeholder results, so a degraded
+        # report is never stored in report_cache
+        self._degraded = False
+        self._formatted_source: Optional[Tuple[ExtractedDocument, str]] = None
 
     def verify_script(
         self,
@@ -48,37 +104,65 @@ class VerifierAgent:
         """
         Verify a podcast script against the source document.
 
-        Cost-optimized: Uses batching and Haiku model.
-        """
-        print("[Verifier] Step 1: Extracting claims from script...")
-        claims = self._extract_claims(script)
-        print(f"[Verifier] Found {len(claims)} factual claims")
+        Cost-optimized: Uses batching and Haiku model. Coverage analysis
+        needs only the script and document, so it runs in the background
+        while claims are extracted and verified. With
+        fuse_extraction_and_coverage, claims and coverage instead come from
+        one Haiku call, falling back to the separate calls if it fails.
 
-        print("[Verifier] Step 2: Verifying claims (batched)...")
-        verifications = self._verify_claims_batched(claims, extracted_doc)
-
-        print("[Verifier] Step 3: Analyzing coverage (batched)...")
-        coverage = self._analyze_coverage_batched(script, extracted_doc)
-
-        # Calculate statistics
-        supported = sum(1 for v in verifications if v.status == "SUPPORTED")
-        partial = sum(1 for v in verifications if v.status == "PARTIALLY_SUPPORTED")
-        not_found = sum(1 for v in verifications if v.status == "NOT_FOUND")
+        With a report_cache, verifying the same script against the same
+        document again returns the stored report without any Claude calls.
+        """
+        report_key = None
+        if self.report_cache is not None:
+            report_key = self._report_cache_key(script, extracted_doc)
+            cached = self.report_cache.get(report_key)
+            if cached is not None:
+                print("[Verifier] This script was already verified against this document, reusing the report")
+                return VerificationReport.model_validate(cached)
+
+        self._degraded = False
+        claims_and_coverage = None
+        if self.fuse_extraction_and_coverage:
+            print("[Verifier] Step 1: Extracting claims and analyzing coverage (one call)...")
+            claims_and_coverage = self._extract_claims_and_coverage(script, extracted_doc)
+
+        if claims_and_coverage is not None:
+            claims, coverage = claims_and_coverage
+            print(f"[Verifier] Found {len(claims)} factual claims")
+
+            print("[Verifier] Step 2: Verifying claims (batched)...")
+            source_sections = self._format_source_for_verification(extracted_doc)
+            verifications = self._verify_claims(claims, source_sections)
+        else:
+            claims, verifications, coverage = self._verify_with_background_coverage(script, extracted_doc)
+
+        # Calculate statistics and identify hallucinations in one pass
+        status_counts = Counter()
+        hallucination_ids = []
+        for i, v in enumerate(verifications):
+            status_counts[v.status] += 1
+            if v.status == VerificationStatus.NOT_FOUND:
+                hallucination_ids.append(i)
+
+        supported = status_counts[VerificationStatus.SUPPORTED]
+        partial = status_counts[VerificationStatus.PARTIALLY_SUPPORTED]
+        not_found = status_counts[VerificationStatus.NOT_FOUND]
 
         support_rate = (supported + partial * 0.5) / len(verifications) * 100 if verifications else 0
 
         # Calculate coverage percentage
-        total_key_points = sum(c.key_points_total for c in coverage)
-        covered_key_points = sum(c.key_points_covered for c in coverage)
+        total_key_points = 0
+        covered_key_points = 0
+        for c in coverage:
+            total_key_points += c.key_points_total
+            covered_key_points += c.key_points_covered
         coverage_pct = covered_key_points / total_key_points * 100 if total_key_points > 0 else 0
 
-        # Identify hallucinations
-        hallucinations = [v for v in verifications if v.status == "NOT_FOUND"]
-
         print(f"[Verifier] Results: {supported} supported, {partial} partial, {not_found} not found")
         print(f"[Verifier] Coverage: {coverage_pct:.1f}%")
 
-        return VerificationReport(
+        report = VerificationReport.build(
             document_title=extracted_doc.title,
             script_title=script.title,
             script_word_count=script.word_count,
@@ -90,134 +174,431 @@ class VerifierAgent:
             overall_coverage_percentage=coverage_pct,
             claim_verifications=verifications,
             coverage_analysis=coverage,
-            hallucination_flags=hallucinations
+            hallucination_flag_ids=hallucination_ids
         )
 
-    def _format_script_for_prompt(self, script: PodcastScript) -> str:
-        """Format script for prompts."""
-        lines = []
-        for i, line in enumerate(script.dialogue):
-            emotion = f" {line.emotion_cue}" if line.emotion_cue else ""
-            lines.append(f"[{i}] {line.speaker}{emotion}: {line.text}")
-        return "\n".join(lines)
+        if report_key is not None and not self._degraded and claims:
+            self.report_cache.put(report_key, report.model_dump())
+
+        return report
+
+    def _report_cache_key(self, script: PodcastScript, doc: ExtractedDocument) -> str:
+        """Cache key for a whole report: the script, the document and everything that shapes the result."""
+        return make_key(
+            EXTRACTION_MODEL,
+            VERIFICATION_MODEL,
+            str(self.fuse_extraction_and_coverage),
+            str(self.use_batch_api),
+            str(self.max_claims_per_batch),
+            str(MAX_BATCH_INPUT_TOKENS),
+            str(OUTPUT_TOKENS_PER_CLAIM),
+            str(CHARS_PER_TOKEN),
+            str(CLAIM_EXTRACTION_PROMPT),
+            str(BATCH_CLAIM_VERIFICATION_SYSTEM),
+            str(BATCH_CLAIM_VERIFICATION_USER_TEMPLATE),
+            str(BATCH_COVERAGE_ANALYSIS_SYSTEM),
+            str(BATCH_COVERAGE_ANALYSIS_USER_TEMPLATE),
+            str(CLAIMS_AND_COVERAGE_SYSTEM),
+            str(CLAIMS_AND_COVERAGE_USER_TEMPLATE),
+            script.model_dump_json(),
+            doc.model_dump_json()
+        )
 
-    def _extract_claims(self, script: PodcastScript) -> List[ExtractedClaim]:
-        """Extract factual claims from the script using Claude."""
-        script_formatted = self._format_script_for_prompt(script)
+    def _verify_with_background_coverage(
+        self,
+        script: PodcastScript,
+        doc: ExtractedDocument
+    ) -> Tuple[List[ExtractedClaim], List[ClaimVerification], List[CoverageItem]]:
+        """Extract and verify claims while coverage is analyzed on a background thread."""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            print("[Verifier] Step 1: Analyzing coverage (batched, in background)...")
+            coverage_future = executor.submit(self._analyze_coverage_batched, script, doc)
 
-        prompt = CLAIM_EXTRACTION_PROMPT.format(script=script_formatted)
+            print("[Verifier] Step 2: Extracting claims from script...")
+            claims = self._extract_claims(script)
+            print(f"[Verifier] Found {len(claims)} factual claims")
 
-        response = self.client.messages.create(
-            model=EXTRACTION_MODEL,
-            max_tokens=4096,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+            print("[Verifier] Step 3: Verifying claims (batched)...")
+            source_sections = self._format_source_for_verification(doc)
+            verifications = self._verify_claims(claims, source_sections)
 
-        response_text = response.content[0].text
-        json_str = self._extract_json(response_text)
+            coverage = coverage_future.result()
+
+        return claims, verifications, coverage
+
+    def _extract_claims(self, script: PodcastScript) -> List[ExtractedClaim]:
+        """Extract factual claims from the script using Claude."""
+        prompt = CLAIM_EXTRACTION_PROMPT.format(script=script.numbered_dialogue)
 
         try:
-            data = json.loads(json_str)
-            claims = []
-            for c in data.get("claims", []):
-                claims.append(ExtractedClaim(
-                    claim=c["claim"],
-                    script_context=c["script_context"],
-                    line_index=c.get("line_index", 0)
-                ))
-            return claims
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"[Verifier] Warning: Failed to parse claims JSON: {e}")
+            extraction = request_structured(
+                self.client,
+                ClaimExtraction,
+                model=EXTRACTION_MODEL,
+                max_tokens=4096,
+                prompt=prompt,
+                tool_name="record_claims",
+                rate_limiter=self.rate_limiter
+            )
+        except StructuredOutputError as e:
+            print(f"[Verifier] Warning: Failed to extract claims: {e}")
+            self._degraded = True
             return []
 
+        return extraction.claims
+
+    def _verify_claims(
+        self,
+        claims: List[ExtractedClaim],
+        source_sections: str
+    ) -> List[ClaimVerification]:
+        """Verify each distinct claim once and share the verdict with its repeats."""
+        # Scripts restate facts (intro, body, recap); claims that differ only
+        # in case or whitespace are verified once
+        representatives = {}
+        for claim in claims:
+            representatives.setdefault(_normalize_claim(claim.claim), claim)
+
+        if len(representatives) == len(claims):
+            return self._verify_claims_batched(claims, source_sections)
+
+        print(f"[Verifier] {len(claims) - len(representatives)} repeated claims share a verification")
+        unique = self._verify_claims_batched(list(representatives.values()), source_sections)
+        by_text = dict(zip(representatives.keys(), unique))
+
+        verifications = []
+        for claim in claims:
+            key = _normalize_claim(claim.claim)
+            verification = by_text[key]
+            if representatives[key] is not claim:
+                # Same verdict, but reported against this occurrence's own wording
+                verification = verification.model_copy(
+                    update={"claim": claim.claim, "script_context": claim.script_context}
+                )
+            verifications.append(verification)
+        return verifications
+
     def _verify_claims_batched(
         self,
         claims: List[ExtractedClaim],
-        doc: ExtractedDocument
+        source_sections: str
     ) -> List[ClaimVerification]:
         """Verify claims in batches for cost efficiency."""
-        source_sections = self._format_source_for_verification(doc)
-        verifications = []
+        # Claims verified in an earlier run against the same source text and
+        # prompt are answered from the cache; only the rest are sent
+        verifications: List[Optional[ClaimVerification]] = [None] * len(claims)
+        cache_keys = []
+        if self.cache is not None:
+            cache_keys = [self._claim_cache_key(c, source_sections) for c in claims]
+            for i, key in enumerate(cache_keys):
+                cached = self.cache.get(key)
+                if cached is not None:
+                    # Entries were validated before they were cached
+                    verifications[i] = ClaimVerification.model_construct(
+                        **{**cached, "status": VerificationStatus[cached["status"]]}
+                    )
 
-        # Process in batches
-        for batch_start in range(0, len(claims), BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, len(claims))
-            batch = claims[batch_start:batch_end]
-            batch_num = batch_start // BATCH_SIZE + 1
-            total_batches = (len(claims) + BATCH_SIZE - 1) // BATCH_SIZE
-
-            print(f"[Verifier] Verifying batch {batch_num}/{total_batches} ({len(batch)} claims)...")
-
-            # Format claims for batch prompt
-            claims_list = "\n".join([
-                f"[{i}] Claim: \"{c.claim}\"\n    Context: \"{c.script_context}\""
-                for i, c in enumerate(batch)
-            ])
-
-            prompt = BATCH_CLAIM_VERIFICATION_PROMPT.format(
-                claims_list=claims_list,
-                source_sections=source_sections,
-                num_claims=len(batch)
-            )
+        pending = [i for i, v in enumerate(verifications) if v is None]
+        if len(pending) < len(claims):
+            print(f"[Verifier] {len(claims) - len(pending)} claims answered from cache")
+
+        pending_claims = [claims[i] for i in pending]
+        # The system block is identical for every batch of the run, so it is
+        # formatted once here instead of once per batch
+        system = BATCH_CLAIM_VERIFICATION_SYSTEM.format(source_sections=source_sections)
+        batches = self._pack_batches(pending_claims, system)
+        if not batches:
+            return verifications
+
+        def record(offset: int, batch_verifications: List[ClaimVerification]) -> None:
+            for i, verification in zip(pending[offset:], batch_verifications):
+                verifications[i] = verification
+                # Placeholders for missing or unparseable answers are not verdicts
+                if self.cache is not None and verification.explanation not in UNVERIFIED_EXPLANATIONS:
+                    self.cache.put(cache_keys[i], verification.model_dump())
+
+        if self.use_batch_api:
+            offline_verifications = self._verify_claims_offline_batch(batches, system)
+            if offline_verifications is not None:
+                record(0, offline_verifications)
+                return verifications
+
+        # A request can only read the prompt cache once an earlier one has
+        # finished writing it, so the first batch runs alone to warm the
+        # cache with the source block before the rest fan out
+        record(0, self._verify_batch(batches[0], 1, len(batches), system))
+        if len(batches) == 1:
+            return verifications
+
+        # The remaining batches are independent network round-trips, so
+        # threads overlap them. Each batch is stored and cached as soon as it
+        # completes rather than after its slower siblings; offsets place it in order
+        offsets = list(accumulate((len(batch) for batch in batches), initial=0))
+        max_workers = max(1, min(len(batches) - 1, self.max_concurrency))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._verify_batch, batches[i], i + 1, len(batches), system): offsets[i]
+                for i in range(1, len(batches))
+            }
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+        return verifications
 
-            response = self.client.messages.create(
+    def _claim_cache_key(self, claim: ExtractedClaim, source_sections: str) -> str:
+        """Cache key for one claim's verification against the formatted source."""
+        return make_key(
+            VERIFICATION_MODEL,
+            str(BATCH_CLAIM_VERIFICATION_SYSTEM),
+            str(BATCH_CLAIM_VERIFICATION_USER_TEMPLATE),
+            source_sections,
+            claim.claim,
+            claim.script_context
+        )
+
+    def _pack_batches(
+        self,
+        claims: List[ExtractedClaim],
+        system: str
+    ) -> List[List[ExtractedClaim]]:
+        """
+        Greedily pack claims into as few verification calls as fit.
+
+        A batch closes when it reaches max_claims_per_batch or when the
+        estimated input (shared system block plus the batch's claims) would
+        exceed MAX_BATCH_INPUT_TOKENS. Fewer, larger batches mean fewer
+        round-trips, and after the first batch the source block is read from
+        the prompt cache.
+        """
+        claim_budget = max(1, MAX_BATCH_INPUT_TOKENS - len(system) // CHARS_PER_TOKEN)
+
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for claim in claims:
+            tokens = (len(claim.claim) + len(claim.script_context)) // CHARS_PER_TOKEN
+            if batch and (len(batch) >= self.max_claims_per_batch or batch_tokens + tokens > claim_budget):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(claim)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _verify_batch(
+        self,
+        batch: List[ExtractedClaim],
+        batch_num: int,
+        total_batches: int,
+        system: str
+    ) -> List[ClaimVerification]:
+        """Verify one batch of claims with a single Claude call."""
+        print(f"[Verifier] Verifying batch {batch_num}/{total_batches} ({len(batch)} claims)...")
+
+        # The source document sits in the system block, which is identical for
+        # every batch of a run; _verify_claims_batched sends the first batch
+        # alone so the others read it from the prompt cache instead of each
+        # writing it again
+        try:
+            result = request_structured(
+                self.client,
+                BatchVerification,
                 model=VERIFICATION_MODEL,
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                max_tokens=max(4096, len(batch) * OUTPUT_TOKENS_PER_CLAIM),
+                system=system,
+                prompt=self._batch_prompt(batch),
+                tool_name=VERIFICATION_TOOL,
+                rate_limiter=self.rate_limiter
             )
+        except StructuredOutputError as e:
+            # One malformed entry should not cost the whole batch; keep every
+            # verdict that validates on its own
+            verdicts = self._salvage_verdicts(e.tool_input)
+            if not verdicts:
+                print(f"[Verifier] Warning: Batch {batch_num} verification failed: {e}")
+                return self._unverified(batch)
+            print(f"[Verifier] Warning: Batch {batch_num} output was partly invalid, kept {len(verdicts)} verdicts")
+            return self._match_verdicts(batch, verdicts)
+
+        return self._match_verdicts(batch, result.verifications)
+
+    def _verify_claims_offline_batch(
+        self,
+        batches: List[List[ExtractedClaim]],
+        system: str
+    ) -> Optional[List[ClaimVerification]]:
+        """
+        Verify all claim batches through the Message Batches API.
+
+        Every batch is submitted in one upload and billed at the discounted
+        batch rate; results arrive asynchronously, so this path suits
+        offline runs rather than interactive ones. A Message Batch may take
+        up to 24 hours, so one still running after BATCH_MAX_WAIT_SECONDS
+        is cancelled and None is returned for the caller to verify the
+        claims synchronously instead.
+        """
+        import anthropic
+
+        print(f"[Verifier] Submitting {len(batches)} verification batches to the Message Batches API...")
+
+        tool = tool_for(BatchVerification, VERIFICATION_TOOL)
+        message_batch = self.client.messages.batches.create(requests=[
+            {
+                "custom_id": f"batch_{i}",
+                "params": {
+                    "model": VERIFICATION_MODEL,
+                    "max_tokens": max(4096, len(batch) * OUTPUT_TOKENS_PER_CLAIM),
+                    "system": cached_system(system, VERIFICATION_MODEL, [tool]),
+                    "tools": [tool],
+                    "tool_choice": {"type": "tool", "name": VERIFICATION_TOOL},
+                    "messages": [{"role": "user", "content": self._batch_prompt(batch)}],
+                },
+            }
+            for i, batch in enumerate(batches)
+        ])
+
+        deadline = time.monotonic() + BATCH_MAX_WAIT_SECONDS
+        delay = BATCH_POLL_INITIAL_SECONDS
+        while message_batch.processing_status != "ended":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(
+                    f"[Verifier] Warning: Message Batch {message_batch.id} still running after "
+                    f"{BATCH_MAX_WAIT_SECONDS:.0f}s, cancelling and verifying synchronously"
+                )
+                try:
+                    self.client.messages.batches.cancel(message_batch.id)
+                except anthropic.APIError as e:  # e.g. it ended in the meantime
+                    print(f"[Verifier] Warning: Could not cancel Message Batch {message_batch.id}: {e}")
+                return None
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, BATCH_POLL_MAX_SECONDS)
+            message_batch = self.client.messages.batches.retrieve(message_batch.id)
+
+        # Results are not returned in submission order; map them back by id
+        verdicts = {}
+        for entry in self.client.messages.batches.results(message_batch.id):
+            if entry.result.type != "succeeded":
+                print(f"[Verifier] Warning: {entry.custom_id} {entry.result.type}")
+                continue
+            tool_use = next((block for block in entry.result.message.content if block.type == "tool_use"), None)
+            tool_input = tool_use.input if tool_use is not None else {}
+            try:
+                verdicts[entry.custom_id] = BatchVerification.model_validate(tool_input).verifications
+            except ValidationError as e:
+                print(f"[Verifier] Warning: Invalid verification for {entry.custom_id}: {e}")
+                verdicts[entry.custom_id] = self._salvage_verdicts(tool_input) or None
 
-            response_text = response.content[0].text
-            json_str = self._extract_json(response_text)
+        verifications = []
+        for i, batch in enumerate(batches):
+            batch_verdicts = verdicts.get(f"batch_{i}")
+            if batch_verdicts is None:
+                verifications.extend(self._unverified(batch))
+            else:
+                verifications.extend(self._match_verdicts(batch, batch_verdicts))
+        return verifications
 
+    def _batch_prompt(self, batch: List[ExtractedClaim]) -> str:
+        """Build the per-batch user message listing the claims to verify."""
+        claims_list = "\n".join([
+            f"[{i}] Claim: \"{c.claim}\"\n    Context: \"{c.script_context}\""
+            for i, c in enumerate(batch)
+        ])
+
+        return BATCH_CLAIM_VERIFICATION_USER_TEMPLATE.format(
+            claims_list=claims_list,
+            num_claims=len(batch)
+        )
+
+    def _salvage_verdicts(self, tool_input: Optional[dict]) -> List[ClaimVerdict]:
+        """Validate the entries of an invalid record_verifications call one by one."""
+        items = tool_input.get("verifications") if isinstance(tool_input, dict) else None
+        if not isinstance(items, list):
+            return []
+
+        verdicts = []
+        for item in items:
             try:
-                data = json.loads(json_str)
-                batch_verifications = data.get("verifications", [])
-
-                for i, claim in enumerate(batch):
-                    # Find matching verification result
-                    v_data = next(
-                        (v for v in batch_verifications if v.get("claim_id") == i),
-                        {"status": "NOT_FOUND", "explanation": "No verification returned"}
-                    )
+                verdicts.append(ClaimVerdict.model_validate(item))
+            except ValidationError:
+                continue
+        return verdicts
 
-                    verifications.append(ClaimVerification(
-                        claim=claim.claim,
-                        script_context=claim.script_context,
-                        source_page=v_data.get("source_page"),
-                        source_quote=v_data.get("source_quote"),
-                        status=v_data.get("status", "NOT_FOUND"),
-                        explanation=v_data.get("explanation", "")
-                    ))
-
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"[Verifier] Warning: Failed to parse batch verification: {e}")
-                # Mark all claims in batch as unverified
-                for claim in batch:
-                    verifications.append(ClaimVerification(
-                        claim=claim.claim,
-                        script_context=claim.script_context,
-                        source_page=None,
-                        source_quote=None,
-                        status="NOT_FOUND",
-                        explanation="Batch verification failed"
-                    ))
+    def _match_verdicts(
+        self,
+        batch: List[ExtractedClaim],
+        verdicts: List[ClaimVerdict]
+    ) -> List[ClaimVerification]:
+        """Match Claude's verdicts back to the claims of a batch."""
+        # Index verdicts once so matching each claim is a dict lookup
+        by_id = {v.claim_id: v for v in verdicts}
+
+        # Verdicts and claims were validated when Claude's tool input was
+        # parsed, so the results are constructed without validating again
+        verifications = []
+        for i, claim in enumerate(batch):
+            verdict = by_id.get(i)
+            if verdict is None:
+                self._degraded = True
+                verifications.append(ClaimVerification.model_construct(
+                    claim=claim.claim,
+                    script_context=claim.script_context,
+                    source_page=None,
+                    source_quote=None,
+                    status=VerificationStatus.NOT_FOUND,
+                    explanation=NO_RESULT_EXPLANATION
+                ))
+                continue
+
+            verifications.append(ClaimVerification.model_construct(
+                claim=claim.claim,
+                script_context=claim.script_context,
+                source_page=verdict.source_page,
+                source_quote=verdict.source_quote,
+                status=VerificationStatus[verdict.status],
+                explanation=verdict.explanation
+            ))
 
         return verifications
 
+    def _unverified(self, batch: List[ExtractedClaim]) -> List[ClaimVerification]:
+        """Mark every claim in a failed batch as unverified."""
+        self._degraded = True
+        return [
+            ClaimVerification.model_construct(
+                claim=claim.claim,
+                script_context=claim.script_context,
+                source_page=None,
+                source_quote=None,
+                status=VerificationStatus.NOT_FOUND,
+                explanation=BATCH_FAILED_EXPLANATION
+            )
+            for claim in batch
+        ]
+
     def _format_source_for_verification(self, doc: ExtractedDocument) -> str:
         """Format source document for verification prompts."""
+        # Regeneration loops verify several scripts against the same document;
+        # reuse the formatted text while the agent is handed the same object
+        if self._formatted_source is not None and self._formatted_source[0] is doc:
+            return self._formatted_source[1]
+
         sections = []
         for section in doc.sections:
             sections.append(f"## {section.name} (pages {', '.join(str(p) for p in section.pages)})")
             for kp in section.key_points:
                 sections.append(f"- Page {kp.page}: \"{kp.source_quote}\"")
-            # Truncate raw text to save tokens
-            sections.append(f"\nRaw text excerpt:\n{section.raw_text[:1500]}...")
-        return "\n\n".join(sections)
+            # Scripts are written from the key points, so their quotes are the
+            # evidence claims trace back to. A raw excerpt is only worth its
+            # tokens for a section that yielded no key points at all
+            if not section.key_points:
+                sections.append(f"\nRaw text excerpt:\n{section.raw_text[:RAW_EXCERPT_CHARS]}...")
+
+        formatted = "\n\n".join(sections)
+        self._formatted_source = (doc, formatted)
+        return formatted
 
     def _analyze_coverage_batched(
         self,
@@ -225,92 +606,118 @@ class VerifierAgent:
         doc: ExtractedDocument
     ) -> List[CoverageItem]:
         """Analyze coverage for all sections in one call."""
-        script_formatted = self._format_script_for_prompt(script)
+        prompt = BATCH_COVERAGE_ANALYSIS_USER_TEMPLATE.format(
+            script=script.numbered_dialogue,
+            num_sections=len(doc.sections)
+        )
 
-        # Format all sections and key points
+        try:
+            analysis = request_structured(
+                self.client,
+                CoverageAnalysis,
+                model=VERIFICATION_MODEL,
+                max_tokens=4096,
+                system=BATCH_COVERAGE_ANALYSIS_SYSTEM.format(
+                    all_sections_key_points=self._format_key_points_for_coverage(doc)
+                ),
+                prompt=prompt,
+                tool_name="record_coverage",
+                rate_limiter=self.rate_limiter
+            )
+        except StructuredOutputError as e:
+            print(f"[Verifier] Warning: Failed to analyze coverage: {e}")
+            return [self._uncovered(section) for section in doc.sections]
+
+        return self._match_coverage(doc, analysis.coverage)
+
+    def _extract_claims_and_coverage(
+        self,
+        script: PodcastScript,
+        doc: ExtractedDocument
+    ) -> Optional[Tuple[List[ExtractedClaim], List[CoverageItem]]]:
+        """Extract claims and analyze coverage with one Haiku call; None if it fails."""
+        prompt = CLAIMS_AND_COVERAGE_USER_TEMPLATE.format(
+            script=script.numbered_dialogue,
+            num_sections=len(doc.sections)
+        )
+
+        try:
+            result = request_structured(
+                self.client,
+                ClaimsAndCoverage,
+                model=VERIFICATION_MODEL,
+                max_tokens=8192,
+                system=CLAIMS_AND_COVERAGE_SYSTEM.format(
+                    all_sections_key_points=self._format_key_points_for_coverage(doc)
+                ),
+                prompt=prompt,
+                tool_name="record_claims_and_coverage",
+                rate_limiter=self.rate_limiter
+            )
+        except StructuredOutputError as e:
+            print(f"[Verifier] Warning: Combined extraction failed, using separate calls: {e}")
+            return None
+
+        return result.claims, self._match_coverage(doc, result.coverage)
+
+    def _format_key_points_for_coverage(self, doc: ExtractedDocument) -> str:
+        """Format each section's key points for coverage prompts."""
         all_sections = []
         for section in doc.sections:
             key_points = "\n".join([f"  - {kp.point}" for kp in section.key_points])
             all_sections.append(f"### {section.name}\n{key_points}")
 
-        all_sections_text = "\n\n".join(all_sections)
+        return "\n\n".join(all_sections)
 
-        prompt = BATCH_COVERAGE_ANALYSIS_PROMPT.format(
-            all_sections_key_points=all_sections_text,
-            script=script_formatted,
-            num_sections=len(doc.sections)
-        )
+    def _match_coverage(self, doc: ExtractedDocument, analysis: List[SectionCoverage]) -> List[CoverageItem]:
+        """Match Claude's coverage entries back to the document's sections."""
+        by_name = {c.section: c for c in analysis}
 
-        response = self.client.messages.create(
-            model=VERIFICATION_MODEL,
-            max_tokens=4096,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+        coverage_items = []
+        for section in doc.sections:
+            c = by_name.get(section.name)
+            if c is None:
+                coverage_items.append(self._uncovered(section))
+                continue
+
+            coverage_items.append(CoverageItem.model_construct(
+                section=section.name,
+                status=CoverageStatus[c.status],
+                key_points_total=c.key_points_total,
+                key_points_covered=c.key_points_covered,
+                covered=c.covered,
+                omitted=c.omitted
+            ))
+
+        return coverage_items
+
+    def _uncovered(self, section: SectionContent) -> CoverageItem:
+        """Coverage entry for a section Claude returned no analysis for."""
+        self._degraded = True
+        return CoverageItem.model_construct(
+            section=section.name,
+            status=CoverageStatus.PARTIAL,
+            key_points_total=len(section.key_points),
+            key_points_covered=0,
+            covered=[],
+            omitted=[kp.point for kp in section.key_points]
         )
 
-        response_text = response.content[0].text
-        json_str = self._extract_json(response_text)
-
-        try:
-            data = json.loads(json_str)
-            coverage_items = []
-
-            for section in doc.sections:
-                # Find matching coverage result
-                c_data = next(
-                    (c for c in data.get("coverage", []) if c.get("section") == section.name),
-                    None
-                )
-
-                if c_data:
-                    coverage_items.append(CoverageItem(
-                        section=section.name,
-                        status=c_data.get("status", "PARTIAL"),
-                        key_points_total=c_data.get("key_points_total", len(section.key_points)),
-                        key_points_covered=c_data.get("key_points_covered", 0),
-                        covered=c_data.get("covered", []),
-                        omitted=c_data.get("omitted", [])
-                    ))
-                else:
-                    coverage_items.append(CoverageItem(
-                        section=section.name,
-                        status="PARTIAL",
-                        key_points_total=len(section.key_points),
-                        key_points_covered=0,
-                        covered=[],
-                        omitted=[kp.point for kp in section.key_points]
-                    ))
-
-            return coverage_items
-
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"[Verifier] Warning: Failed to parse coverage: {e}")
-            return [
-                CoverageItem(
-                    section=section.name,
-                    status="PARTIAL",
-                    key_points_total=len(section.key_points),
-                    key_points_covered=0,
-                    covered=[],
-                    omitted=[kp.point for kp in section.key_points]
-                )
-                for section in doc.sections
-            ]
 
-    def _extract_json(self, text: str) -> str:
-        """Extract JSON from response text."""
-        if "```json" in text:
-            return text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            return text.split("```")[1].split("```")[0].strip()
-        return text.strip()
+def _normalize_claim(text: str) -> str:
+    """Comparison key for spotting repeated claims: lowercased, whitespace collapsed."""
+    return " ".join(text.lower().split())
 
 
 def verify_script(
     script: PodcastScript,
     extracted_doc: ExtractedDocument,
-    client: anthropic.Anthropic
+    client: "anthropic.Anthropic",
+    use_batch_api: bool = False,
+    cache: Optional[ResponseCache] = None,
+    fuse_extraction_and_coverage: bool = False,
+    report_cache: Optional[ResponseCache] = None,
+    rate_limiter: Optional[RateLimiter] = None
 ) -> VerificationReport:
     """
     Convenience function to verify script.
@@ -319,9 +726,21 @@ def verify_script(
         script: Generated podcast script
         extracted_doc: Source document with key points
         client: Anthropic client
+        use_batch_api: Verify claims through the Message Batches API (cheaper, but not interactive)
+        cache: Optional response cache for per-claim verifications
+        fuse_extraction_and_coverage: Extract claims and analyze coverage in one Haiku call
+        report_cache: Optional cache of whole reports per (script, document) pair
+        rate_limiter: Optional limiter shared with other agents using the same API key
 
     Returns:
         VerificationReport with claim traceability and coverage
     """
-    agent = VerifierAgent(client)
+    agent = VerifierAgent(
+        client,
+        rate_limiter=rate_limiter,
+        use_batch_api=use_batch_api,
+        cache=cache,
+        fuse_extraction_and_coverage=fuse_extraction_and_coverage,
+        report_cache=report_cache
+    )
     return agent.verify_script(script, extracted_doc)